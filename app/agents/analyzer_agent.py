@@ -4,30 +4,60 @@ Uses ReAct pattern (Reason-Act-Observe).
 """
 
 import os
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+import numpy as np
 from langchain_groq import ChatGroq
 from tenacity import retry, stop_after_attempt, wait_exponential
 from app.utils.logger import logger
 from app.utils.exceptions import AgentException
+from app.utils.fastmath import column_means
 from app.models.schemas import AgentState
 
+METRIC_KEYS = ("activity_minutes", "sleep_hours", "water_intake_ml", "steps", "heart_rate")
+
+NO_DATA_SUMMARY = "No user data available"
+LIMITED_DATA_SUMMARY = "Limited data available"
+COLD_START_ANALYSIS = "User has no logged data yet; provide general health guidance."
+
 
 class AnalyzerAgent:
     """Analyzes user health data and identifies patterns."""
     
-    def __init__(self):
-        self.llm = ChatGroq(
+    _REASON_PROMPT = """You are analyzing health data. Reason about what patterns or issues to look for.
+
+User Query: {query}
+User Data Summary: {summary}
+
+In 2-3 sentences, state what health patterns you need to identify."""
+    
+    _ACT_PROMPT = """Analyze this health data and identify key patterns, issues, or areas of concern.
+
+User Data: {summary}
+User Query: {query}
+
+Provide:
+1. Key metrics (averages, trends)
+2. Potential health concerns
+3. Positive patterns
+4. Areas needing improvement
+
+Be concise (under 300 words)."""
+    
+    def __init__(self, llm: Optional[ChatGroq] = None):
+        self.llm = llm or ChatGroq(
             api_key=os.getenv("GROQ_API_KEY"),
             model_name=os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"),
             temperature=float(os.getenv("GROQ_TEMPERATURE", "0.7")),
             max_tokens=int(os.getenv("GROQ_MAX_TOKENS", "2048"))
         )
+        self.executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_MAX_CONCURRENCY", "4")))
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def _call_llm(self, prompt: str) -> str:
-        """Call LLM with retry logic."""
+    def _call_llm(self, prompt: str, **llm_kwargs) -> str:
+        """Call LLM with retry logic. llm_kwargs override model settings (e.g. max_tokens) per call."""
         try:
-            response = self.llm.invoke(prompt)
+            response = self.llm.invoke(prompt, **llm_kwargs)
             return response.content
         except Exception as e:
             logger.error(f"LLM call failed: {e}")
@@ -41,12 +71,27 @@ class AnalyzerAgent:
         logger.info(f"Analyzer agent started for user {state.user_id}")
         
         try:
+            user_data_summary = self._summarize_user_data(state.user_data)
+            
+            # Nothing to analyze for cold-start users, so skip both LLM calls
+            if user_data_summary in (NO_DATA_SUMMARY, LIMITED_DATA_SUMMARY):
+                state.analysis = COLD_START_ANALYSIS
+                state.reasoning_trace.append(f"[Analyzer] {user_data_summary}; skipped analysis")
+                state.next_agent = "retriever"
+                
+                logger.info("Analyzer agent completed without user data")
+                return state
+            
+            # REASON and ACT only depend on the query and user data, so run both LLM calls concurrently
+            reason_future = self.executor.submit(self._reason, state, user_data_summary)
+            act_future = self.executor.submit(self._act, state, user_data_summary)
+            
             # REASON: Determine what analysis is needed
-            reasoning = self._reason(state)
+            reasoning = reason_future.result()
             state.reasoning_trace.append(f"[Analyzer-Reason] {reasoning}")
             
             # ACT: Perform analysis
-            analysis_result = self._act(state)
+            analysis_result = act_future.result()
             state.reasoning_trace.append(f"[Analyzer-Act] Analyzed user data")
             
             # OBSERVE: Extract insights
@@ -62,39 +107,19 @@ class AnalyzerAgent:
             logger.error(f"Analyzer agent error: {e}")
             raise AgentException(f"Analysis failed: {e}")
     
-    def _reason(self, state: AgentState) -> str:
+    def _reason(self, state: AgentState, user_data_summary: str) -> str:
         """Reason about what analysis is needed."""
-        user_data_summary = self._summarize_user_data(state.user_data)
-        
-        prompt = f"""You are analyzing health data. Reason about what patterns or issues to look for.
-
-User Query: {state.query}
-User Data Summary: {user_data_summary}
-
-In 2-3 sentences, state what health patterns you need to identify."""
+        prompt = self._REASON_PROMPT.format(query=state.query, summary=user_data_summary)
         
         try:
-            reasoning = self._call_llm(prompt)
+            reasoning = self._call_llm(prompt, max_tokens=128, temperature=0)
             return reasoning.strip()
         except Exception as e:
             return f"Analyze general health patterns from available data: {str(e)}"
     
-    def _act(self, state: AgentState) -> str:
+    def _act(self, state: AgentState, user_data_summary: str) -> str:
         """Perform data analysis."""
-        user_data_summary = self._summarize_user_data(state.user_data)
-        
-        prompt = f"""Analyze this health data and identify key patterns, issues, or areas of concern.
-
-User Data: {user_data_summary}
-User Query: {state.query}
-
-Provide:
-1. Key metrics (averages, trends)
-2. Potential health concerns
-3. Positive patterns
-4. Areas needing improvement
-
-Be concise (under 300 words)."""
+        prompt = self._ACT_PROMPT.format(summary=user_data_summary, query=state.query)
         
         analysis = self._call_llm(prompt)
         return analysis
@@ -106,24 +131,20 @@ Be concise (under 300 words)."""
     def _summarize_user_data(self, user_data: Dict[str, Any]) -> str:
         """Create concise summary of user data."""
         if not user_data:
-            return "No user data available"
+            return NO_DATA_SUMMARY
         
         summary_parts = []
         
         if "logs" in user_data and user_data["logs"]:
             logs = user_data["logs"][:7]  # Last 7 entries
             
-            metrics = {}
-            for log in logs:
-                for key in ["activity_minutes", "sleep_hours", "water_intake_ml", "steps", "heart_rate"]:
-                    if log.get(key):
-                        if key not in metrics:
-                            metrics[key] = []
-                        metrics[key].append(log[key])
+            # Missing and zero readings are excluded from the averages
+            values = np.array([[log.get(key) or np.nan for key in METRIC_KEYS] for log in logs], dtype=np.float64)
+            averages = column_means(values, ~np.isnan(values))
             
-            for metric, values in metrics.items():
-                avg = sum(values) / len(values)
-                summary_parts.append(f"Avg {metric}: {avg:.1f}")
+            for metric, avg in zip(METRIC_KEYS, averages):
+                if not np.isnan(avg):
+                    summary_parts.append(f"Avg {metric}: {avg:.1f}")
         
         if "profile" in user_data and user_data["profile"]:
             profile = user_data["profile"]
@@ -132,4 +153,4 @@ Be concise (under 300 words)."""
             if profile.get("health_goals"):
                 summary_parts.append(f"Goals: {', '.join(profile['health_goals'][:3])}")
         
-        return "; ".join(summary_parts) if summary_parts else "Limited data available"
\ No newline at end of file
+        return "; ".join(summary_parts) if summary_parts else LIMITED_DATA_SUMMARY
\ No newline at end of file
@@ -4,8 +4,10 @@ Uses ReAct pattern (Reason-Act-Observe).
 """
 
 import os
+import re
 import uuid
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Tuple, Optional, Iterator
 from datetime import datetime
 from langchain_groq import ChatGroq
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -14,24 +16,71 @@ from app.utils.exceptions import AgentException, RecommendationException
 from app.utils.tools import RecommenderTool
 from app.models.schemas import AgentState
 
+# Single-pass parsing of structured LLM output
+_FIELD_RE = re.compile(r"(RECOMMENDATION|REASONING|CATEGORY):(.*)")
+_BATCH_INDEX_RE = re.compile(r"^\s*\[(\d+)\]", re.MULTILINE)
+
 
 class RecommenderAgent:
     """Generates personalized health recommendations."""
     
-    def __init__(self):
-        self.llm = ChatGroq(
+    _REASON_PROMPT = """Based on this health analysis and context, what recommendation strategy should be used?
+
+Analysis: {analysis}
+Context: {context}
+
+In 2 sentences, state the recommendation approach (e.g., focus on hydration and sleep)."""
+    
+    _BATCH_PROMPT = """Personalize each of these health recommendations for the user.
+
+Base Recommendations:
+{numbered}
+
+User Analysis: {analysis}
+Health Context: {context}
+
+For each base recommendation provide:
+1. Personalized recommendation (1-2 sentences)
+2. Reasoning (why this helps, 1-2 sentences)
+3. Category (one of: hydration, sleep, exercise, nutrition, stress)
+
+Format (one block per recommendation, prefixed with its [index]):
+[1]
+RECOMMENDATION: [text]
+REASONING: [text]
+CATEGORY: [category]"""
+    
+    _PERSONALIZE_PROMPT = """Personalize this health recommendation for the user.
+
+Base Recommendation: {rec_text}
+User Analysis: {analysis}
+Health Context: {context}
+
+Provide:
+1. Personalized recommendation (1-2 sentences)
+2. Reasoning (why this helps, 1-2 sentences)
+3. Category (one of: hydration, sleep, exercise, nutrition, stress)
+
+Format:
+RECOMMENDATION: [text]
+REASONING: [text]
+CATEGORY: [category]"""
+    
+    def __init__(self, llm: Optional[ChatGroq] = None):
+        self.llm = llm or ChatGroq(
             api_key=os.getenv("GROQ_API_KEY"),
             model_name=os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"),
             temperature=float(os.getenv("GROQ_TEMPERATURE", "0.7")),
             max_tokens=int(os.getenv("GROQ_MAX_TOKENS", "2048"))
         )
         self.recommender_tool = RecommenderTool()
+        self.executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_MAX_CONCURRENCY", "4")))
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def _call_llm(self, prompt: str) -> str:
-        """Call LLM with retry logic."""
+    def _call_llm(self, prompt: str, **llm_kwargs) -> str:
+        """Call LLM with retry logic. llm_kwargs override model settings (e.g. max_tokens) per call."""
         try:
-            response = self.llm.invoke(prompt)
+            response = self.llm.invoke(prompt, **llm_kwargs)
             return response.content
         except Exception as e:
             logger.error(f"LLM call failed: {e}")
@@ -61,30 +110,63 @@ class RecommenderAgent:
             
             logger.info("Recommender agent completed")
             return state
-            
+        
         except Exception as e:
             logger.error(f"Recommender agent error: {e}")
             raise AgentException(f"Recommendation generation failed: {e}")
     
     def _reason(self, state: AgentState) -> str:
         """Reason about recommendation strategy."""
-        context_summary = "\n".join(state.retrieved_context[:5])
+        analysis_summary = state.analysis[:300]
+        context_summary = "\n".join(state.retrieved_context[:5])[:300]
         
-        prompt = f"""Based on this health analysis and context, what recommendation strategy should be used?
-
-Analysis: {state.analysis[:300]}
-Context: {context_summary[:300]}
-
-In 2 sentences, state the recommendation approach (e.g., focus on hydration and sleep)."""
+        prompt = self._REASON_PROMPT.format(analysis=analysis_summary, context=context_summary)
         
         try:
-            strategy = self._call_llm(prompt)
+            strategy = self._call_llm(prompt, max_tokens=128, temperature=0)
             return strategy.strip()
         except Exception as e:
             return f"Provide balanced recommendations across key health areas: {str(e)}"
     
+    def recommend_stream(self, state: AgentState) -> Iterator[Dict[str, Any]]:
+        """
+        Generate recommendations like recommend(), yielding each one as soon as it is ready.
+        state.recommendations and the reasoning trace are complete once the iterator is exhausted.
+        """
+        logger.info(f"Recommender agent streaming for user {state.user_id}")
+        
+        try:
+            # REASON: Determine recommendation strategy
+            strategy = self._reason(state)
+            state.reasoning_trace.append(f"[Recommender-Reason] {strategy}")
+            
+            # ACT + OBSERVE per recommendation, in completion order
+            state.recommendations = []
+            generated = 0
+            for _, raw_recommendation in self._generate_recommendations(state):
+                generated += 1
+                for rec in self._observe([raw_recommendation], state):
+                    state.recommendations.append(rec)
+                    yield rec
+            
+            state.reasoning_trace.append(f"[Recommender-Act] Generated {generated} recommendations")
+            state.reasoning_trace.append(f"[Recommender-Observe] Finalized {len(state.recommendations)} recommendations")
+            
+            state.next_agent = None  # End of workflow
+            
+            logger.info("Recommender agent completed")
+        
+        except Exception as e:
+            logger.error(f"Recommender agent error: {e}")
+            raise AgentException(f"Recommendation generation failed: {e}")
+    
     def _act(self, state: AgentState) -> List[Dict[str, Any]]:
         """Generate personalized recommendations."""
+        indexed = sorted(self._generate_recommendations(state), key=lambda item: item[0])
+        return [rec for _, rec in indexed]
+    
+    def _generate_recommendations(self, state: AgentState) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (index, recommendation) pairs as soon as each personalized recommendation is ready."""
         # Build user context for embedding-based matching
         user_context = self._build_user_context(state)
         
@@ -98,59 +180,115 @@ In 2 sentences, state the recommendation approach (e.g., focus on hydration and
             logger.error(f"Recommender tool error: {e}")
             base_recommendations = []
         
-        # Enhance with LLM reasoning
-        recommendations = []
-        context_str = "\n".join(state.retrieved_context[:5])
+        # Enhance with LLM reasoning: one batched call for all base recommendations
+        analysis_str = state.analysis[:400]
+        context_str = "\n".join(state.retrieved_context[:5])[:400]
+        base_recommendations = base_recommendations[:3]
+        if not base_recommendations:
+            return
         
-        for rec_text, score in base_recommendations[:3]:
-            prompt = f"""Personalize this health recommendation for the user.
-
-Base Recommendation: {rec_text}
-User Analysis: {state.analysis[:400]}
-Health Context: {context_str[:400]}
-
-Provide:
-1. Personalized recommendation (1-2 sentences)
-2. Reasoning (why this helps, 1-2 sentences)
-3. Category (one of: hydration, sleep, exercise, nutrition, stress)
-
-Format:
-RECOMMENDATION: [text]
-REASONING: [text]
-CATEGORY: [category]"""
-            
+        done = set()
+        for i, parsed in self._personalize_batch(base_recommendations, analysis_str, context_str):
+            if 1 <= i <= len(base_recommendations) and i not in done:
+                done.add(i)
+                rec_text, score = base_recommendations[i - 1]
+                yield i, self._build_recommendation(parsed, rec_text, score)
+        
+        yield from self._personalize_missing(base_recommendations, done, analysis_str, context_str)
+    
+    def _personalize_batch(
+        self, base_recommendations: List[Tuple[str, float]], analysis_str: str, context_str: str
+    ) -> Iterator[Tuple[int, Dict[str, str]]]:
+        """
+        Personalize all base recommendations in one streamed LLM call.
+        Yields (index, parsed) for block [i] as soon as block [i+1] starts, and the last block when the stream ends.
+        """
+        buffer = ""
+        consumed = 0
+        try:
+            for chunk in self.llm.stream(
+                self._build_batch_prompt(base_recommendations, analysis_str, context_str),
+                max_tokens=256 * len(base_recommendations),
+                temperature=0
+            ):
+                buffer += chunk.content
+                markers = list(_BATCH_INDEX_RE.finditer(buffer, consumed))
+                if len(markers) > 1:
+                    # Everything before the latest marker is a complete block
+                    yield from self._parse_batch_response(buffer[consumed:markers[-1].start()]).items()
+                    consumed = markers[-1].start()
+        except Exception as e:
+            # Not retried: items not yet yielded fall through to the per-item retries
+            logger.error(f"Batched personalization failed: {e}")
+            return
+        
+        yield from self._parse_batch_response(buffer[consumed:]).items()
+    
+    def _personalize_missing(
+        self, base_recommendations: List[Tuple[str, float]], done: set, analysis_str: str, context_str: str
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Retry individually (concurrently) only the items the batch did not cover, in completion order."""
+        futures = {}
+        for i, (rec_text, score) in enumerate(base_recommendations, 1):
+            if i in done:
+                continue
+            future = self.executor.submit(
+                self._call_llm,
+                self._build_personalize_prompt(rec_text, analysis_str, context_str),
+                max_tokens=256,
+                temperature=0
+            )
+            futures[future] = i
+        
+        for future in as_completed(futures):
+            i = futures[future]
+            rec_text, score = base_recommendations[i - 1]
             try:
-                response = self._call_llm(prompt)
-                parsed = self._parse_llm_response(response)
-                
-                recommendations.append({
-                    "text": parsed.get("recommendation", rec_text),
-                    "reasoning": parsed.get("reasoning", "Based on your health patterns"),
-                    "category": parsed.get("category", "general"),
-                    "confidence_score": score,
-                    "source": "embedding+llm"
-                })
+                parsed = self._parse_llm_response(future.result())
+                yield i, self._build_recommendation(parsed, rec_text, score)
             except Exception as e:
                 logger.error(f"Error enhancing recommendation: {e}")
-                recommendations.append({
+                yield i, {
                     "text": rec_text,
                     "reasoning": "Based on health best practices",
                     "category": "general",
                     "confidence_score": score,
                     "source": "embedding"
-                })
+                }
+    
+    def _build_recommendation(self, parsed: Dict[str, str], rec_text: str, score: float) -> Dict[str, Any]:
+        """Build recommendation dict from parsed LLM output, defaulting to the base recommendation."""
+        return {
+            "text": parsed.get("recommendation", rec_text),
+            "reasoning": parsed.get("reasoning", "Based on your health patterns"),
+            "category": parsed.get("category", "general"),
+            "confidence_score": score,
+            "source": "embedding+llm"
+        }
+    
+    def _build_batch_prompt(self, base_recommendations: List[Tuple[str, float]], analysis_str: str, context_str: str) -> str:
+        """Build a single prompt personalizing all base recommendations at once."""
+        numbered = "\n".join(f"[{i}] {rec_text}" for i, (rec_text, _) in enumerate(base_recommendations, 1))
         
-        return recommendations
+        return self._BATCH_PROMPT.format(numbered=numbered, analysis=analysis_str, context=context_str)
+    
+    def _build_personalize_prompt(self, rec_text: str, analysis_str: str, context_str: str) -> str:
+        """Build prompt for personalizing a single base recommendation."""
+        return self._PERSONALIZE_PROMPT.format(rec_text=rec_text, analysis=analysis_str, context=context_str)
     
     def _observe(self, raw_recommendations: List[Dict[str, Any]], state: AgentState) -> List[Dict[str, Any]]:
         """Validate and format final recommendations."""
         final_recommendations = []
         
-        for rec in raw_recommendations:
+        # One timestamp and one urandom read for the whole batch
+        now_iso = datetime.now().isoformat()
+        random_bytes = os.urandom(16 * len(raw_recommendations))
+        
+        for i, rec in enumerate(raw_recommendations):
             # Add metadata
-            rec["suggestion_id"] = str(uuid.uuid4())
+            rec["suggestion_id"] = str(uuid.UUID(bytes=random_bytes[i * 16:(i + 1) * 16], version=4))
             rec["user_id"] = state.user_id
-            rec["timestamp"] = datetime.now().isoformat()
+            rec["timestamp"] = now_iso
             
             # Ensure required fields
             if not rec.get("text"):
@@ -181,13 +319,21 @@ CATEGORY: [category]"""
         """Parse structured LLM response."""
         parsed = {}
         
-        lines = response.strip().split("\n")
-        for line in lines:
-            if "RECOMMENDATION:" in line:
-                parsed["recommendation"] = line.split("RECOMMENDATION:", 1)[1].strip()
-            elif "REASONING:" in line:
-                parsed["reasoning"] = line.split("REASONING:", 1)[1].strip()
-            elif "CATEGORY:" in line:
-                parsed["category"] = line.split("CATEGORY:", 1)[1].strip().lower()
+        for field, value in _FIELD_RE.findall(response):
+            value = value.strip()
+            parsed[field.lower()] = value.lower() if field == "CATEGORY" else value
+        
+        return parsed
+    
+    def _parse_batch_response(self, response: str) -> Dict[int, Dict[str, str]]:
+        """Parse batched LLM response into per-index structured results."""
+        parsed_by_index = {}
+        
+        # re.split with a capture group yields [preamble, index, block, index, block, ...]
+        parts = _BATCH_INDEX_RE.split(response.strip())
+        for index, block in zip(parts[1::2], parts[2::2]):
+            parsed = self._parse_llm_response(block)
+            if parsed.get("recommendation"):
+                parsed_by_index[int(index)] = parsed
         
-        return parsed
\ No newline at end of file
+        return parsed_by_index
\ No newline at end of file
@@ -4,7 +4,10 @@ Uses ReAct pattern (Reason-Act-Observe).
 """
 
 import os
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from cachetools import TTLCache
 from langchain_groq import ChatGroq
 from tenacity import retry, stop_after_attempt, wait_exponential
 from app.utils.logger import logger
@@ -16,8 +19,15 @@ from app.models.schemas import AgentState
 class RetrieverAgent:
     """Retrieves relevant health information from RAG and ontology."""
     
-    def __init__(self):
-        self.llm = ChatGroq(
+    _REASON_PROMPT = """Extract 3-5 key health concepts/terms to search for based on this analysis.
+
+Analysis: {analysis}
+User Query: {query}
+
+Return ONLY a comma-separated list of search terms (e.g., "hydration, sleep, exercise")."""
+    
+    def __init__(self, llm: Optional[ChatGroq] = None):
+        self.llm = llm or ChatGroq(
             api_key=os.getenv("GROQ_API_KEY"),
             model_name=os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"),
             temperature=float(os.getenv("GROQ_TEMPERATURE", "0.7")),
@@ -25,12 +35,22 @@ class RetrieverAgent:
         )
         self.rag_tool = RAGTool()
         self.ontology_tool = OntologyTool()
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        # Query terms repeat heavily across users (the fallback list is fixed), so
+        # retrieval results are shared for a short TTL keyed by the sorted terms.
+        # The key includes the RAG store version, so documents added through this
+        # process invalidate it; additions by other processes show up after the TTL.
+        self._retrieval_cache = TTLCache(
+            maxsize=int(os.getenv("RETRIEVAL_CACHE_SIZE", "2048")),
+            ttl=int(os.getenv("RETRIEVAL_CACHE_TTL", "600"))
+        )
+        self._retrieval_cache_lock = threading.Lock()
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def _call_llm(self, prompt: str) -> str:
-        """Call LLM with retry logic."""
+    def _call_llm(self, prompt: str, **llm_kwargs) -> str:
+        """Call LLM with retry logic. llm_kwargs override model settings (e.g. max_tokens) per call."""
         try:
-            response = self.llm.invoke(prompt)
+            response = self.llm.invoke(prompt, **llm_kwargs)
             return response.content
         except Exception as e:
             logger.error(f"LLM call failed: {e}")
@@ -60,22 +80,17 @@ class RetrieverAgent:
             
             logger.info("Retriever agent completed")
             return state
-            
+        
         except Exception as e:
             logger.error(f"Retriever agent error: {e}")
             raise AgentException(f"Retrieval failed: {e}")
     
     def _reason(self, state: AgentState) -> List[str]:
         """Reason about what information to retrieve."""
-        prompt = f"""Extract 3-5 key health concepts/terms to search for based on this analysis.
-
-Analysis: {state.analysis}
-User Query: {state.query}
-
-Return ONLY a comma-separated list of search terms (e.g., "hydration, sleep, exercise")."""
+        prompt = self._REASON_PROMPT.format(analysis=state.analysis, query=state.query)
         
         try:
-            response = self._call_llm(prompt)
+            response = self._call_llm(prompt, max_tokens=64, temperature=0)
             terms = [term.strip().lower() for term in response.split(",")]
             return terms[:5]
         except Exception as e:
@@ -83,23 +98,43 @@ Return ONLY a comma-separated list of search terms (e.g., "hydration, sleep, exe
             return ["hydration", "sleep", "exercise"]
     
     def _act(self, query_terms: List[str], state: AgentState) -> tuple:
-        """Execute retrieval from RAG and ontology."""
-        # RAG retrieval
-        rag_results = []
+        """Execute retrieval from RAG and ontology, reusing cached results for identical terms."""
+        key = (self.rag_tool.version, tuple(sorted(query_terms)))
+        with self._retrieval_cache_lock:
+            cached = self._retrieval_cache.get(key)
+        if cached is not None:
+            logger.debug(f"Retrieval cache hit for {key}")
+            return cached
+        
+        # RAG and ontology lookups are independent, so run them side by side
+        rag_future = self.executor.submit(self._retrieve_rag, query_terms)
+        ontology_future = self.executor.submit(self._query_ontology, query_terms)
+        rag_results, rag_ok = rag_future.result()
+        ontology_results, ontology_ok = ontology_future.result()
+        
+        # Only cache complete results so a transient failure is not served for the whole TTL
+        if rag_ok and ontology_ok:
+            with self._retrieval_cache_lock:
+                self._retrieval_cache[key] = (rag_results, ontology_results)
+        
+        return rag_results, ontology_results
+    
+    def _retrieve_rag(self, query_terms: List[str]) -> tuple:
+        """Query the RAG store. Returns (results, succeeded)."""
         try:
             query = " ".join(query_terms)
-            rag_results = self.rag_tool.retrieve(query)
+            return self.rag_tool.retrieve(query), True
         except RetrievalException as e:
             logger.error(f"RAG retrieval error: {e}")
-        
-        # Ontology query
-        ontology_results = {}
+            return [], False
+    
+    def _query_ontology(self, query_terms: List[str]) -> tuple:
+        """Query the ontology. Returns (results, succeeded)."""
         try:
-            ontology_results = self.ontology_tool.query(query_terms)
+            return self.ontology_tool.query(query_terms), True
         except Exception as e:
             logger.error(f"Ontology query error: {e}")
-        
-        return rag_results, ontology_results
+            return {}, False
     
     def _observe(self, rag_results: List[str], ontology_results: dict, state: AgentState) -> List[str]:
         """Filter and structure retrieved information."""
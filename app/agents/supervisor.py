@@ -4,10 +4,12 @@ Routes between Analyzer, Retriever, and Recommender agents.
 """
 
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional, Tuple
+import httpx
 from langgraph.graph import StateGraph, END
 from langchain_groq import ChatGroq
 from app.utils.logger import logger
+from app.utils.llm_cache import LRULLMCache
 from app.utils.exceptions import AgentException
 from app.models.schemas import AgentState
 from app.agents.analyzer_agent import AnalyzerAgent
@@ -19,15 +21,32 @@ class SupervisorWorkflow:
     """Supervisor coordinating health coach agent workflow."""
     
     def __init__(self):
-        self.llm = ChatGroq(
+        # Reuse responses for identical prompts across requests; scoped to this client rather than
+        # LangChain's process-global cache
+        cache_size = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+        
+        # One client (and HTTP connection pool) shared by all agents; routing itself needs no LLM
+        llm = ChatGroq(
             api_key=os.getenv("GROQ_API_KEY"),
             model_name=os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"),
-            temperature=float(os.getenv("GROQ_TEMPERATURE", "0.7"))
+            temperature=float(os.getenv("GROQ_TEMPERATURE", "0.7")),
+            max_tokens=int(os.getenv("GROQ_MAX_TOKENS", "2048")),
+            http_client=httpx.Client(limits=httpx.Limits(max_connections=64)),
+            cache=LRULLMCache(maxsize=cache_size) if cache_size > 0 else None
         )
         
-        self.analyzer = AnalyzerAgent()
-        self.retriever = RetrieverAgent()
-        self.recommender = RecommenderAgent()
+        self.analyzer = AnalyzerAgent(llm)
+        self.retriever = RetrieverAgent(llm)
+        self.recommender = RecommenderAgent(llm)
+        
+        # Node -> (runner, router, router outcome -> next node); shared by the compiled graph and
+        # execute_stream so the two cannot drift apart
+        self._graph_spec = {
+            "analyzer": (self._analyzer_node, self._route_from_analyzer, {"retriever": "retriever", "end": END}),
+            "retriever": (self._retriever_node, self._route_from_retriever, {"recommender": "recommender", "end": END}),
+            "recommender": (self._recommender_node, self._route_from_recommender, {"end": END})
+        }
+        self._entry_point = "analyzer"
         
         self.workflow = self._build_workflow()
     
@@ -36,73 +55,60 @@ class SupervisorWorkflow:
         workflow = StateGraph(AgentState)
         
         # Add agent nodes
-        workflow.add_node("analyzer", self._analyzer_node)
-        workflow.add_node("retriever", self._retriever_node)
-        workflow.add_node("recommender", self._recommender_node)
+        for name, (node, _, _) in self._graph_spec.items():
+            workflow.add_node(name, node)
         
         # Set entry point
-        workflow.set_entry_point("analyzer")
+        workflow.set_entry_point(self._entry_point)
         
         # Add edges based on routing logic
-        workflow.add_conditional_edges(
-            "analyzer",
-            self._route_from_analyzer,
-            {
-                "retriever": "retriever",
-                "end": END
-            }
-        )
-        
-        workflow.add_conditional_edges(
-            "retriever",
-            self._route_from_retriever,
-            {
-                "recommender": "recommender",
-                "end": END
-            }
-        )
-        
-        workflow.add_conditional_edges(
-            "recommender",
-            self._route_from_recommender,
-            {
-                "end": END
-            }
-        )
+        for name, (_, router, edges) in self._graph_spec.items():
+            workflow.add_conditional_edges(name, router, edges)
         
         return workflow.compile()
     
+    @staticmethod
+    def _as_agent_state(state: Any) -> AgentState:
+        """Wrap graph state as AgentState without re-validating it (inputs are validated once at entry)."""
+        if isinstance(state, AgentState):
+            return state
+        return AgentState.model_construct(**state)
+    
+    @staticmethod
+    def _next_agent(state: Any) -> Optional[str]:
+        """Read the routing field directly; routers run on every edge and need nothing else."""
+        if isinstance(state, dict):
+            return state.get("next_agent")
+        return getattr(state, "next_agent", None)
+    
     def _analyzer_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Execute analyzer agent."""
         logger.info("Supervisor: Routing to Analyzer")
-        agent_state = AgentState(**state)
-        result = self.analyzer.analyze(agent_state)
-        return result.model_dump()
+        result = self.analyzer.analyze(self._as_agent_state(state))
+        return dict(result)
     
     def _retriever_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Execute retriever agent."""
         logger.info("Supervisor: Routing to Retriever")
-        agent_state = AgentState(**state)
-        result = self.retriever.retrieve(agent_state)
-        return result.model_dump()
+        result = self.retriever.retrieve(self._as_agent_state(state))
+        return dict(result)
     
     def _recommender_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Execute recommender agent."""
         logger.info("Supervisor: Routing to Recommender")
-        agent_state = AgentState(**state)
-        result = self.recommender.recommend(agent_state)
-        return result.model_dump()
+        result = self.recommender.recommend(self._as_agent_state(state))
+        return dict(result)
     
     def _route_from_analyzer(self, state: Dict[str, Any]) -> str:
         """Route after analyzer completes."""
-        next_agent = state.get("next_agent")
+        next_agent = self._next_agent(state)
         if next_agent == "retriever":
             return "retriever"
         return "end"
     
     def _route_from_retriever(self, state: Dict[str, Any]) -> str:
         """Route after retriever completes."""
-        next_agent = state.get("next_agent")
+        next_agent = self._next_agent(state)
         if next_agent == "recommender":
             return "recommender"
         return "end"
@@ -135,4 +141,37 @@ class SupervisorWorkflow:
             
         except Exception as e:
             logger.error(f"Supervisor workflow error: {e}")
+            raise AgentException(f"Workflow execution failed: {e}")
+    
+    def execute_stream(self, user_id: str, query: str, user_data: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        """
+        Execute the workflow, yielding ("suggestion", rec) events as each recommendation is ready,
+        followed by a final ("reasoning", reasoning_trace) event.
+        """
+        logger.info(f"Supervisor: Starting streaming workflow for user {user_id}")
+        
+        try:
+            state = dict(AgentState(user_id=user_id, query=query, user_data=user_data))
+            
+            # Walk the same nodes and routers as the compiled graph; only the recommender is swapped
+            # for its streaming variant so each suggestion is yielded as soon as it is ready
+            node = self._entry_point
+            while node != END:
+                runner, router, edges = self._graph_spec[node]
+                if node == "recommender":
+                    logger.info("Supervisor: Routing to Recommender")
+                    agent_state = self._as_agent_state(state)
+                    for rec in self.recommender.recommend_stream(agent_state):
+                        yield "suggestion", rec
+                    state = dict(agent_state)
+                else:
+                    state = runner(state)
+                node = edges[router(state)]
+            
+            logger.info(f"Supervisor: Streaming workflow completed with {len(state['recommendations'])} recommendations")
+            
+            yield "reasoning", state["reasoning_trace"]
+            
+        except Exception as e:
+            logger.error(f"Supervisor streaming workflow error: {e}")
             raise AgentException(f"Workflow execution failed: {e}")
\ No newline at end of file
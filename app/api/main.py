@@ -4,10 +4,15 @@ FastAPI application for health coach service.
 
 import os
 import time
+import asyncio
 from typing import List
+from datetime import datetime
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, status
+import anyio
+import orjson
+from fastapi import FastAPI, HTTPException, BackgroundTasks, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 
 from app.utils.logger import logger
@@ -19,14 +24,27 @@ from app.agents.supervisor import SupervisorWorkflow
 load_dotenv()
 
 
+async def _checkpoint_periodically(db: Database):
+    """Checkpoint the SQLite WAL on a timer so it does not happen mid-request."""
+    interval = int(os.getenv("WAL_CHECKPOINT_INTERVAL", "300"))
+    while True:
+        await asyncio.sleep(interval)
+        await anyio.to_thread.run_sync(db.checkpoint)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle management for FastAPI app."""
     logger.info("Starting Health Coach API")
+    # Blocking DB and agent work is offloaded to worker threads; size the pool for concurrent requests
+    anyio.to_thread.current_default_thread_limiter().total_tokens = int(os.getenv("API_THREAD_POOL_SIZE", "64"))
     app.state.db = Database(os.getenv("DATABASE_PATH", "data/health_coach.db"))
     app.state.supervisor = SupervisorWorkflow()
+    checkpoint_task = asyncio.create_task(_checkpoint_periodically(app.state.db))
     yield
     logger.info("Shutting down Health Coach API")
+    checkpoint_task.cancel()
+    app.state.db.close()
 
 
 app = FastAPI(
@@ -45,6 +63,38 @@ app.add_middleware(
 )
 
 
+def _to_suggestion(rec: dict) -> Suggestion:
+    """Convert a workflow recommendation dict to a Suggestion.
+    
+    The workflow builds these dicts itself, so field validation is skipped and
+    only the two non-native values are converted explicitly.
+    """
+    timestamp = rec["timestamp"]
+    return Suggestion.model_construct(
+        suggestion_id=rec["suggestion_id"],
+        user_id=rec["user_id"],
+        timestamp=datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else timestamp,
+        category=rec["category"],
+        text=rec["text"],
+        reasoning=rec["reasoning"],
+        confidence_score=float(rec["confidence_score"]),
+        source=rec["source"]
+    )
+
+
+def _sse_event(event: str, data: str) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def _store_suggestions(db: Database, suggestions: List[Suggestion]):
+    """Persist generated suggestions (runs after the response is sent)."""
+    try:
+        db.insert_suggestions(suggestions)
+    except Exception as e:
+        logger.error(f"Error storing suggestions: {e}")
+
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -57,7 +107,7 @@ async def log_user_data(log: UserLog):
     try:
         start_time = time.time()
         
-        app.state.db.insert_user_log(log)
+        await anyio.to_thread.run_sync(app.state.db.insert_user_log, log)
         
         latency = time.time() - start_time
         logger.info(f"Data logged for user {log.user_id} - Latency: {latency:.3f}s")
@@ -76,7 +126,7 @@ async def log_user_data(log: UserLog):
 async def create_or_update_profile(profile: UserProfile):
     """Create or update user profile."""
     try:
-        app.state.db.upsert_user_profile(profile)
+        await anyio.to_thread.run_sync(app.state.db.upsert_user_profile, profile)
         return {"status": "success", "message": "Profile updated successfully"}
     
     except DatabaseException as e:
@@ -91,7 +141,7 @@ async def create_or_update_profile(profile: UserProfile):
 async def get_profile(user_id: str):
     """Get user profile."""
     try:
-        profile = app.state.db.get_user_profile(user_id)
+        profile = await anyio.to_thread.run_sync(app.state.db.get_user_profile, user_id)
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
         return profile
@@ -107,15 +157,17 @@ async def get_profile(user_id: str):
 
 
 @app.post("/get_suggestion", response_model=SuggestionResponse)
-async def get_suggestions(request: SuggestionRequest):
+async def get_suggestions(request: SuggestionRequest, background_tasks: BackgroundTasks):
     """Get personalized health suggestions using agentic workflow."""
     try:
         start_time = time.time()
         logger.info(f"Suggestion request for user {request.user_id}")
         
-        # Gather user data
-        user_logs = app.state.db.get_user_logs(request.user_id, limit=30)
-        user_profile = app.state.db.get_user_profile(request.user_id)
+        # Gather user data (independent reads run concurrently)
+        user_logs, user_profile = await asyncio.gather(
+            anyio.to_thread.run_sync(app.state.db.get_user_logs, request.user_id, 30),
+            anyio.to_thread.run_sync(app.state.db.get_user_profile, request.user_id)
+        )
         
         user_data = {
             "logs": user_logs,
@@ -123,32 +175,18 @@ async def get_suggestions(request: SuggestionRequest):
         }
         
         # Execute agentic workflow
-        result = app.state.supervisor.execute(
-            user_id=request.user_id,
-            query=request.query,
-            user_data=user_data
+        result = await anyio.to_thread.run_sync(
+            app.state.supervisor.execute,
+            request.user_id,
+            request.query,
+            user_data
         )
         
         # Convert to Suggestion objects
-        suggestions = []
-        for rec in result.get("recommendations", []):
-            suggestion = Suggestion(
-                suggestion_id=rec["suggestion_id"],
-                user_id=rec["user_id"],
-                timestamp=rec["timestamp"],
-                category=rec["category"],
-                text=rec["text"],
-                reasoning=rec["reasoning"],
-                confidence_score=rec["confidence_score"],
-                source=rec["source"]
-            )
-            suggestions.append(suggestion)
-            
-            # Store in database
-            try:
-                app.state.db.insert_suggestion(suggestion)
-            except Exception as e:
-                logger.error(f"Error storing suggestion: {e}")
+        suggestions = [_to_suggestion(rec) for rec in result.get("recommendations", [])]
+        
+        # Store in database in one batch, off the response path
+        background_tasks.add_task(_store_suggestions, app.state.db, suggestions)
         
         latency = time.time() - start_time
         logger.info(f"Suggestions generated for user {request.user_id} - Count: {len(suggestions)} - Latency: {latency:.3f}s")
@@ -166,11 +204,65 @@ async def get_suggestions(request: SuggestionRequest):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.post("/get_suggestion/stream")
+async def stream_suggestions(request: SuggestionRequest, background_tasks: BackgroundTasks):
+    """Stream personalized health suggestions as server-sent events, each as soon as it is ready."""
+    try:
+        logger.info(f"Streaming suggestion request for user {request.user_id}")
+        
+        user_logs, user_profile = await asyncio.gather(
+            anyio.to_thread.run_sync(app.state.db.get_user_logs, request.user_id, 30),
+            anyio.to_thread.run_sync(app.state.db.get_user_profile, request.user_id)
+        )
+    
+    except DatabaseException as e:
+        logger.error(f"Database error gathering user data: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error gathering user data: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    
+    user_data = {
+        "logs": user_logs,
+        "profile": user_profile
+    }
+    suggestions = []
+    
+    def event_stream():
+        # Sync generator: Starlette iterates it in a worker thread, so the blocking workflow stays off the event loop
+        start_time = time.time()
+        try:
+            for event, data in app.state.supervisor.execute_stream(request.user_id, request.query, user_data):
+                if event == "suggestion":
+                    suggestion = _to_suggestion(data)
+                    suggestions.append(suggestion)
+                    yield _sse_event("suggestion", suggestion.model_dump_json())
+                else:
+                    yield _sse_event("reasoning", orjson.dumps(data).decode())
+            
+            latency = time.time() - start_time
+            logger.info(
+                f"Suggestions streamed for user {request.user_id} - Count: {len(suggestions)} - Latency: {latency:.3f}s"
+            )
+        
+        except AgentException as e:
+            logger.error(f"Agent error streaming suggestions: {e}")
+            yield _sse_event("error", orjson.dumps({"detail": str(e)}).decode())
+        except Exception as e:
+            logger.error(f"Error streaming suggestions: {e}")
+            yield _sse_event("error", orjson.dumps({"detail": "Internal server error"}).decode())
+    
+    # Runs after the stream completes, once all suggestions have been collected
+    background_tasks.add_task(_store_suggestions, app.state.db, suggestions)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @app.get("/logs/{user_id}")
 async def get_user_logs(user_id: str, limit: int = 30):
     """Get user health logs."""
     try:
-        logs = app.state.db.get_user_logs(user_id, limit=limit)
+        logs = await anyio.to_thread.run_sync(app.state.db.get_user_logs, user_id, limit)
         return {"logs": logs, "count": len(logs)}
     
     except DatabaseException as e:
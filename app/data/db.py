@@ -2,44 +2,208 @@
 Database operations for SQLite.
 """
 
+import os
 import sqlite3
-import json
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+import orjson
 from app.utils.logger import logger
 from app.utils.exceptions import DatabaseException
 from app.models.schemas import UserLog, UserProfile, Suggestion
 
+# Timestamps are stored as INTEGER unix-epoch milliseconds
+_CREATE_USER_LOGS_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        activity_minutes INTEGER,
+        sleep_hours REAL,
+        water_intake_ml INTEGER,
+        calories INTEGER,
+        heart_rate INTEGER,
+        steps INTEGER,
+        mood TEXT
+    )
+"""
+
+_CREATE_SUGGESTIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        suggestion_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        category TEXT,
+        text TEXT,
+        reasoning TEXT,
+        confidence_score REAL,
+        source TEXT
+    )
+"""
+
+# Statement text is kept constant so sqlite3's per-connection statement cache
+# re-binds the prepared statement instead of re-compiling it on every call.
+_INSERT_LOG_SQL = """
+    INSERT INTO user_logs (
+        user_id, timestamp, activity_minutes, sleep_hours,
+        water_intake_ml, calories, heart_rate, steps, mood
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SELECT_LOGS_SQL = """
+    SELECT * FROM user_logs 
+    WHERE user_id = ? 
+    ORDER BY timestamp DESC 
+    LIMIT ?
+"""
+
+# SQLite 3.45+ stores JSON columns as pre-parsed JSONB; json() renders either form back to text
+_JSONB_SUPPORTED = sqlite3.sqlite_version_info >= (3, 45, 0)
+_JSON_PARAM = "jsonb(?)" if _JSONB_SUPPORTED else "?"
+
+_UPSERT_PROFILE_SQL = f"""
+    INSERT INTO user_profiles (
+        user_id, age, weight_kg, height_cm, health_goals, medical_conditions
+    ) VALUES (?, ?, ?, ?, {_JSON_PARAM}, {_JSON_PARAM})
+    ON CONFLICT(user_id) DO UPDATE SET
+        age = excluded.age,
+        weight_kg = excluded.weight_kg,
+        height_cm = excluded.height_cm,
+        health_goals = excluded.health_goals,
+        medical_conditions = excluded.medical_conditions
+"""
+
+_SELECT_PROFILE_SQL = """
+    SELECT user_id, age, weight_kg, height_cm,
+           json(health_goals) AS health_goals,
+           json(medical_conditions) AS medical_conditions
+    FROM user_profiles WHERE user_id = ?
+""" if _JSONB_SUPPORTED else "SELECT * FROM user_profiles WHERE user_id = ?"
+
+_INSERT_SUGGESTION_SQL = """
+    INSERT INTO suggestions (
+        suggestion_id, user_id, timestamp, category, text,
+        reasoning, confidence_score, source
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _to_millis(value: datetime) -> int:
+    """Convert a datetime to unix-epoch milliseconds."""
+    return int(value.timestamp() * 1000)
+
+
+def _from_millis(value: int) -> str:
+    """Convert unix-epoch milliseconds back to a timezone-aware UTC ISO-8601 string."""
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc).isoformat()
+
+
+def _log_params(log: UserLog) -> tuple:
+    """Bind parameters for _INSERT_LOG_SQL."""
+    return (
+        log.user_id, _to_millis(log.timestamp),
+        log.activity_minutes, log.sleep_hours, log.water_intake_ml,
+        log.calories, log.heart_rate, log.steps, log.mood
+    )
+
+
+def _suggestion_params(suggestion: Suggestion) -> tuple:
+    """Bind parameters for _INSERT_SUGGESTION_SQL."""
+    return (
+        suggestion.suggestion_id, suggestion.user_id,
+        _to_millis(suggestion.timestamp), suggestion.category,
+        suggestion.text, suggestion.reasoning,
+        suggestion.confidence_score, suggestion.source
+    )
+
 
 class Database:
     """SQLite database handler."""
     
-    def __init__(self, db_path: str = "data/health_coach.db"):
+    def __init__(self, db_path: str = "data/health_coach.db", pool_size: Optional[int] = None):
         self.db_path = db_path
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        
+        # One shared writer (SQLite serializes writes anyway) and a pool of read-only readers
+        self._write_lock = threading.Lock()
+        self._writer = self._open(db_path)
+        # Let the WAL grow larger between automatic checkpoints; checkpoint() truncates it off the request path
+        self._writer.execute(f"PRAGMA wal_autocheckpoint={int(os.getenv('WAL_AUTOCHECKPOINT_PAGES', '10000'))}")
+        # WAL lets readers proceed while a write is in progress (persists in the DB file; cannot run inside a transaction)
+        self._writer.execute("PRAGMA journal_mode=WAL")
         self._init_db()
+        
+        pool_size = pool_size or int(os.getenv("DB_READ_POOL_SIZE", "4"))
+        read_uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        self._readers = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._readers.put(self._open(read_uri, uri=True))
+        
+        atexit.register(self.close)
+    
+    def _open(self, database: str, uri: bool = False) -> sqlite3.Connection:
+        """Open a connection shareable across threads and apply per-connection pragmas."""
+        # Autocommit mode: transactions are opened explicitly by _write_conn
+        conn = sqlite3.connect(database, uri=uri, check_same_thread=False, isolation_level=None)
+        # journal_mode=WAL persists in the file; these pragmas are per-connection
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+    
+    @contextmanager
+    def _write_conn(self):
+        """Hold the writer connection exclusively inside BEGIN IMMEDIATE; commits on success, rolls back on error."""
+        with self._write_lock:
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+    
+    @contextmanager
+    def _read_conn(self):
+        """Borrow a read-only connection from the pool."""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+    
+    def checkpoint(self):
+        """Fold the WAL back into the database file and truncate it."""
+        try:
+            with self._write_lock:
+                self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            logger.error("WAL checkpoint error: %s", e)
+    
+    def close(self):
+        """Close the writer and all pooled reader connections."""
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
     
     def _init_db(self):
         """Initialize database tables."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._write_conn() as conn:
                 cursor = conn.cursor()
                 
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS user_logs (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id TEXT NOT NULL,
-                        timestamp TEXT NOT NULL,
-                        activity_minutes INTEGER,
-                        sleep_hours REAL,
-                        water_intake_ml INTEGER,
-                        calories INTEGER,
-                        heart_rate INTEGER,
-                        steps INTEGER,
-                        mood TEXT
-                    )
-                """)
+                cursor.execute(_CREATE_USER_LOGS_SQL.format(table="user_logs"))
                 
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS user_profiles (
@@ -47,124 +211,135 @@ class Database:
                         age INTEGER,
                         weight_kg REAL,
                         height_cm REAL,
-                        health_goals TEXT,
-                        medical_conditions TEXT
+                        health_goals BLOB,
+                        medical_conditions BLOB
                     )
                 """)
                 
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS suggestions (
-                        suggestion_id TEXT PRIMARY KEY,
-                        user_id TEXT NOT NULL,
-                        timestamp TEXT NOT NULL,
-                        category TEXT,
-                        text TEXT,
-                        reasoning TEXT,
-                        confidence_score REAL,
-                        source TEXT
-                    )
-                """)
+                cursor.execute(_CREATE_SUGGESTIONS_SQL.format(table="suggestions"))
+                
+                self._migrate_text_timestamps(conn)
                 
-                conn.commit()
-                logger.info(f"Database initialized at {self.db_path}")
+                # Serve history fetches (WHERE user_id = ? ORDER BY timestamp DESC) from an index range scan
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_user_ts ON user_logs(user_id, timestamp DESC)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_suggestions_user ON suggestions(user_id, timestamp DESC)")
+                
+                # Refresh planner statistics; analysis_limit keeps this cheap on large tables
+                cursor.execute("PRAGMA analysis_limit=400")
+                cursor.execute("ANALYZE")
+                
+                logger.info("Database initialized at %s", self.db_path)
         except sqlite3.Error as e:
-            logger.error(f"Database initialization error: {e}")
+            logger.error("Database initialization error: %s", e)
             raise DatabaseException(f"Failed to initialize database: {e}")
     
+    def _migrate_text_timestamps(self, conn: sqlite3.Connection):
+        """Rebuild tables created with ISO TEXT timestamps so they store INTEGER unix-millis."""
+        for table, create_sql in (("user_logs", _CREATE_USER_LOGS_SQL), ("suggestions", _CREATE_SUGGESTIONS_SQL)):
+            columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+            if not any(column[1] == "timestamp" and column[2].upper() == "TEXT" for column in columns):
+                continue
+            
+            # TEXT affinity would coerce integers back to text, so the column type itself must change
+            names = [column[1] for column in columns]
+            selected = ", ".join("_iso_to_millis(timestamp)" if name == "timestamp" else name for name in names)
+            conn.create_function("_iso_to_millis", 1, lambda ts: _to_millis(datetime.fromisoformat(ts)), deterministic=True)
+            
+            conn.execute(create_sql.format(table=f"{table}_migrated"))
+            conn.execute(f"INSERT INTO {table}_migrated ({', '.join(names)}) SELECT {selected} FROM {table}")
+            conn.execute(f"DROP TABLE {table}")
+            conn.execute(f"ALTER TABLE {table}_migrated RENAME TO {table}")
+            logger.info("Migrated %s timestamps to unix milliseconds", table)
+    
     def insert_user_log(self, log: UserLog) -> bool:
         """Insert user health log."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO user_logs (
-                        user_id, timestamp, activity_minutes, sleep_hours,
-                        water_intake_ml, calories, heart_rate, steps, mood
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    log.user_id, log.timestamp.isoformat(),
-                    log.activity_minutes, log.sleep_hours, log.water_intake_ml,
-                    log.calories, log.heart_rate, log.steps, log.mood
-                ))
-                conn.commit()
+            with self._write_conn() as conn:
+                conn.execute(_INSERT_LOG_SQL, _log_params(log))
                 return True
         except sqlite3.Error as e:
-            logger.error(f"Error inserting user log: {e}")
+            logger.error("Error inserting user log: %s", e)
             raise DatabaseException(f"Failed to insert log: {e}")
     
+    def insert_user_logs(self, logs: List[UserLog]) -> bool:
+        """Insert multiple user health logs in a single transaction."""
+        if not logs:
+            return True
+        
+        try:
+            with self._write_conn() as conn:
+                conn.executemany(_INSERT_LOG_SQL, [_log_params(log) for log in logs])
+                return True
+        except sqlite3.Error as e:
+            logger.error("Error inserting user logs: %s", e)
+            raise DatabaseException(f"Failed to insert logs: {e}")
+    
     def get_user_logs(self, user_id: str, limit: int = 30) -> List[Dict[str, Any]]:
         """Retrieve user logs."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM user_logs 
-                    WHERE user_id = ? 
-                    ORDER BY timestamp DESC 
-                    LIMIT ?
-                """, (user_id, limit))
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+            with self._read_conn() as conn:
+                cursor = conn.execute(_SELECT_LOGS_SQL, (user_id, limit))
+                # Plain tuples zipped with column names resolved once, instead of a Row object per row
+                columns = tuple(column[0] for column in cursor.description)
+                logs = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                for log in logs:
+                    log["timestamp"] = _from_millis(log["timestamp"])
+                return logs
         except sqlite3.Error as e:
-            logger.error(f"Error retrieving user logs: {e}")
+            logger.error("Error retrieving user logs: %s", e)
             raise DatabaseException(f"Failed to retrieve logs: {e}")
     
     def upsert_user_profile(self, profile: UserProfile) -> bool:
         """Insert or update user profile."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT OR REPLACE INTO user_profiles (
-                        user_id, age, weight_kg, height_cm, health_goals, medical_conditions
-                    ) VALUES (?, ?, ?, ?, ?, ?)
-                """, (
+            with self._write_conn() as conn:
+                conn.execute(_UPSERT_PROFILE_SQL, (
                     profile.user_id, profile.age, profile.weight_kg, profile.height_cm,
-                    json.dumps(profile.health_goals), json.dumps(profile.medical_conditions)
+                    orjson.dumps(profile.health_goals).decode(),
+                    orjson.dumps(profile.medical_conditions).decode()
                 ))
-                conn.commit()
                 return True
         except sqlite3.Error as e:
-            logger.error(f"Error upserting user profile: {e}")
+            logger.error("Error upserting user profile: %s", e)
             raise DatabaseException(f"Failed to upsert profile: {e}")
     
     def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve user profile."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._read_conn() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT * FROM user_profiles WHERE user_id = ?", (user_id,))
+                cursor.row_factory = sqlite3.Row
+                cursor.execute(_SELECT_PROFILE_SQL, (user_id,))
                 row = cursor.fetchone()
                 if row:
                     profile = dict(row)
-                    profile['health_goals'] = json.loads(profile['health_goals'])
-                    profile['medical_conditions'] = json.loads(profile['medical_conditions'])
+                    profile['health_goals'] = orjson.loads(profile['health_goals'])
+                    profile['medical_conditions'] = orjson.loads(profile['medical_conditions'])
                     return profile
                 return None
         except sqlite3.Error as e:
-            logger.error(f"Error retrieving user profile: {e}")
+            logger.error("Error retrieving user profile: %s", e)
             raise DatabaseException(f"Failed to retrieve profile: {e}")
     
     def insert_suggestion(self, suggestion: Suggestion) -> bool:
         """Insert suggestion."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO suggestions (
-                        suggestion_id, user_id, timestamp, category, text,
-                        reasoning, confidence_score, source
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    suggestion.suggestion_id, suggestion.user_id,
-                    suggestion.timestamp.isoformat(), suggestion.category,
-                    suggestion.text, suggestion.reasoning,
-                    suggestion.confidence_score, suggestion.source
-                ))
-                conn.commit()
+            with self._write_conn() as conn:
+                conn.execute(_INSERT_SUGGESTION_SQL, _suggestion_params(suggestion))
+                return True
+        except sqlite3.Error as e:
+            logger.error("Error inserting suggestion: %s", e)
+            raise DatabaseException(f"Failed to insert suggestion: {e}")
+    
+    def insert_suggestions(self, suggestions: List[Suggestion]) -> bool:
+        """Insert multiple suggestions in a single transaction."""
+        if not suggestions:
+            return True
+        
+        try:
+            with self._write_conn() as conn:
+                conn.executemany(_INSERT_SUGGESTION_SQL, [_suggestion_params(s) for s in suggestions])
                 return True
         except sqlite3.Error as e:
-            logger.error(f"Error inserting suggestion: {e}")
-            raise DatabaseException(f"Failed to insert suggestion: {e}")
\ No newline at end of file
+            logger.error("Error inserting suggestions: %s", e)
+            raise DatabaseException(f"Failed to insert suggestions: {e}")
\ No newline at end of file
@@ -3,7 +3,10 @@ Streamlit frontend for Personalized Health Coach.
 """
 
 import os
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+import pandas as pd
 import streamlit as st
 from datetime import datetime
 from dotenv import load_dotenv
@@ -19,6 +22,36 @@ st.set_page_config(
     layout="wide"
 )
 
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Shared HTTP session so backend calls reuse keep-alive connections across reruns."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = get_session()
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_logs(user_id: str, limit: int = 30) -> dict:
+    """Fetch a user's logs; cached briefly so repeat loads skip the round trip. Errors are not cached."""
+    response = session.get(f"{API_BASE_URL}/logs/{user_id}?limit={limit}")
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+def error_detail(response: requests.Response) -> str:
+    """Error detail from an API response, or the raw body when it is not JSON (e.g. a proxy error page)."""
+    try:
+        return orjson.loads(response.content).get('detail', 'Unknown error')
+    except orjson.JSONDecodeError:
+        return response.text or 'Unknown error'
+
+
 st.title("🏥 Personalized Health Coach")
 st.markdown("Your AI-powered health companion for personalized wellness recommendations")
 
@@ -62,12 +95,14 @@ with tab1:
                     "mood": mood
                 }
                 
-                response = requests.post(f"{API_BASE_URL}/log_data", json=payload)
+                response = session.post(f"{API_BASE_URL}/log_data", json=payload)
                 
                 if response.status_code == 201:
-                    st.success(f"✅ Data logged successfully! (Latency: {response.json().get('latency_ms', 0)}ms)")
+                    fetch_logs.clear()
+                    latency_ms = orjson.loads(response.content).get('latency_ms', 0)
+                    st.success(f"✅ Data logged successfully! (Latency: {latency_ms}ms)")
                 else:
-                    st.error(f"❌ Error: {response.json().get('detail', 'Unknown error')}")
+                    st.error(f"❌ Error: {orjson.loads(response.content).get('detail', 'Unknown error')}")
             
             except Exception as e:
                 st.error(f"❌ Connection error: {str(e)}")
@@ -90,10 +125,10 @@ with tab2:
                     "query": query
                 }
                 
-                response = requests.post(f"{API_BASE_URL}/get_suggestion", json=payload)
+                response = session.post(f"{API_BASE_URL}/get_suggestion", json=payload)
                 
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     suggestions = data.get("suggestions", [])
                     reasoning = data.get("reasoning", [])
                     
@@ -114,7 +149,7 @@ with tab2:
                     else:
                         st.warning("No recommendations generated. Try logging more health data.")
                 else:
-                    st.error(f"❌ Error: {response.json().get('detail', 'Unknown error')}")
+                    st.error(f"❌ Error: {orjson.loads(response.content).get('detail', 'Unknown error')}")
             
             except Exception as e:
                 st.error(f"❌ Connection error: {str(e)}")
@@ -126,42 +161,38 @@ with tab3:
     if st.button("Load History"):
         with st.spinner("Loading history..."):
             try:
-                response = requests.get(f"{API_BASE_URL}/logs/{user_id}?limit=30")
+                data = fetch_logs(user_id, 30)
+                logs = data.get("logs", [])
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    logs = data.get("logs", [])
+                if logs:
+                    st.success(f"✅ Loaded {len(logs)} entries")
                     
-                    if logs:
-                        st.success(f"✅ Loaded {len(logs)} entries")
-                        
-                        # Display logs
-                        st.dataframe(
-                            logs,
-                            use_container_width=True,
-                            hide_index=True
-                        )
+                    # Parse once; the table and both charts share the same frame
+                    df = pd.DataFrame(logs)
+                    
+                    # Display logs
+                    st.dataframe(
+                        df,
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                    
+                    # Simple charts (oldest first); reindex tolerates metrics absent from every log
+                    if len(logs) > 1:
+                        trends = df.reindex(columns=["sleep_hours", "activity_minutes"]).iloc[::-1].reset_index(drop=True)
+                        trends = trends.where(trends > 0)
                         
-                        # Simple charts
-                        if len(logs) > 1:
-                            col1, col2 = st.columns(2)
-                            
-                            with col1:
-                                st.subheader("Sleep Trend")
-                                sleep_data = [log.get("sleep_hours", 0) for log in reversed(logs) if log.get("sleep_hours")]
-                                if sleep_data:
-                                    st.line_chart(sleep_data)
-                            
-                            with col2:
-                                st.subheader("Activity Trend")
-                                activity_data = [log.get("activity_minutes", 0) for log in reversed(logs) if log.get("activity_minutes")]
-                                if activity_data:
-                                    st.line_chart(activity_data)
-                    else:
-                        st.info("No health data logged yet. Start logging in the first tab!")
+                        charts = [("sleep_hours", "Sleep Trend"), ("activity_minutes", "Activity Trend")]
+                        for column, (metric, title) in zip(st.columns(2), charts):
+                            with column:
+                                st.subheader(title)
+                                if trends[metric].notna().any():
+                                    st.line_chart(trends[metric].dropna().reset_index(drop=True))
                 else:
-                    st.error(f"❌ Error: {response.json().get('detail', 'Unknown error')}")
+                    st.info("No health data logged yet. Start logging in the first tab!")
             
+            except requests.HTTPError as e:
+                st.error(f"❌ Error: {error_detail(e.response)}")
             except Exception as e:
                 st.error(f"❌ Connection error: {str(e)}")
 
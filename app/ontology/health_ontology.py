@@ -4,6 +4,7 @@ Represents relationships between health concepts.
 """
 
 import networkx as nx
+import numpy as np
 from typing import List, Dict, Set
 from app.utils.logger import logger
 
@@ -58,63 +59,58 @@ class HealthOntology:
         ]
         
         self.graph.add_edges_from(relationships)
-        logger.info(f"Health ontology built: {self.graph.number_of_nodes()} nodes, {self.graph.number_of_edges()} edges")
+        
+        # The ontology is read-only once built, so resolve adjacency and ancestors/descendants
+        # up front; tuples keep NetworkX's edge insertion order for the direct neighbours
+        self._succ = {node: tuple(self.graph.successors(node)) for node in self.graph}
+        self._pred = {node: tuple(self.graph.predecessors(node)) for node in self.graph}
+        self._nodes = tuple(self.graph)
+        self._reach = self._transitive_closure()
+        
+        # Related = descendants (row) or ancestors (column), excluding the concept itself
+        related = (self._reach | self._reach.T) & ~np.eye(len(self._nodes), dtype=bool)
+        self._related = {
+            node: tuple(self._nodes[j] for j in np.flatnonzero(related[i]))
+            for i, node in enumerate(self._nodes)
+        }
+        self._paths = dict(nx.all_pairs_shortest_path(self.graph.to_undirected()))
+        logger.info("Health ontology built: %s nodes, %s edges", self.graph.number_of_nodes(), self.graph.number_of_edges())
+    
+    def _transitive_closure(self) -> np.ndarray:
+        """Boolean (N, N) matrix where [i, j] is True if concept j is reachable from concept i."""
+        reach = nx.to_numpy_array(self.graph, nodelist=self._nodes, dtype=bool)
+        # Squaring doubles the covered path length, so this converges in O(log N) products
+        while True:
+            step = reach | (reach.astype(np.int32) @ reach.astype(np.int32) > 0)
+            if np.array_equal(step, reach):
+                return reach
+            reach = step
     
     def get_related_concepts(self, concept: str, depth: int = 2) -> Set[str]:
         """Get concepts related to given concept within depth."""
-        if concept not in self.graph:
-            return set()
-        
-        related = set()
-        
-        # Get descendants (concepts affected by this one)
-        try:
-            descendants = nx.descendants(self.graph, concept)
-            related.update(descendants)
-        except nx.NetworkXError:
-            pass
-        
-        # Get ancestors (concepts that affect this one)
-        try:
-            ancestors = nx.ancestors(self.graph, concept)
-            related.update(ancestors)
-        except nx.NetworkXError:
-            pass
-        
-        return related
+        return set(self._related.get(concept, ()))
     
     def get_path_between(self, source: str, target: str) -> List[str]:
         """Get shortest path between two concepts."""
-        if source not in self.graph or target not in self.graph:
-            return []
-        
-        try:
-            path = nx.shortest_path(self.graph.to_undirected(), source, target)
-            return path
-        except nx.NetworkXNoPath:
-            return []
+        return list(self._paths.get(source, {}).get(target, ()))
     
     def get_influence_concepts(self, concept: str) -> List[str]:
         """Get concepts directly influenced by given concept."""
-        if concept not in self.graph:
-            return []
-        return list(self.graph.successors(concept))
+        return list(self._succ.get(concept, ()))
     
     def get_influencing_concepts(self, concept: str) -> List[str]:
         """Get concepts that directly influence given concept."""
-        if concept not in self.graph:
-            return []
-        return list(self.graph.predecessors(concept))
+        return list(self._pred.get(concept, ()))
     
     def query_ontology(self, query_terms: List[str]) -> Dict[str, List[str]]:
         """Query ontology with multiple terms and return related concepts."""
         results = {}
         for term in query_terms:
             term_lower = term.lower()
-            if term_lower in self.graph:
+            if term_lower in self._succ:
                 results[term_lower] = {
                     "influences": self.get_influence_concepts(term_lower),
                     "influenced_by": self.get_influencing_concepts(term_lower),
-                    "related": list(self.get_related_concepts(term_lower, depth=1))
+                    "related": list(self._related[term_lower])
                 }
         return results
\ No newline at end of file
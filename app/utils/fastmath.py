@@ -0,0 +1,22 @@
+"""
+Numeric helpers for hot aggregation paths.
+"""
+
+import numpy as np
+
+
+def column_means(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Compute per-column means over the entries selected by mask.
+    
+    Args:
+        values: 2D float array of shape (rows, columns)
+        mask: Boolean array of the same shape; True marks a valid entry
+    
+    Returns:
+        1D array of column means (NaN for columns with no valid entries)
+    """
+    counts = mask.sum(axis=0)
+    totals = np.where(mask, values, 0.0).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return totals / counts
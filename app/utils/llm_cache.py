@@ -0,0 +1,40 @@
+"""
+Bounded in-process cache for LLM responses.
+Identical (prompt, model settings) pairs are answered without a Groq round-trip.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+
+
+class LRULLMCache(BaseCache):
+    """Thread-safe LRU cache keyed by prompt and serialized LLM settings."""
+    
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[tuple, RETURN_VAL_TYPE]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Return cached generations for prompt, if present."""
+        key = (prompt, llm_string)
+        with self._lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+    
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store generations for prompt, evicting the least recently used entry when full."""
+        with self._lock:
+            self._cache[(prompt, llm_string)] = return_val
+            self._cache.move_to_end((prompt, llm_string))
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+    
+    def clear(self, **kwargs: Any) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._cache.clear()
\ No newline at end of file
@@ -21,23 +21,24 @@ def setup_logger(name: str = "health_coach") -> logging.Logger:
     
     Senior note: Using basicConfig for simplicity; file + console output for debugging.
     """
-    # Create logs directory if it doesn't exist
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    
-    # Get log configuration from environment
-    log_level = os.getenv("LOG_LEVEL", "INFO")
-    log_file = os.getenv("LOG_FILE", "logs/health_coach.log")
-    
-    # Configure logging
-    logging.basicConfig(
-        level=getattr(logging, log_level),
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
+    # Configure the root logger only once per process; basicConfig would be a no-op
+    # on later calls, but building the FileHandler argument still opens the file
+    if not logging.getLogger().handlers:
+        # Get log configuration from environment
+        log_level = os.getenv("LOG_LEVEL", "INFO")
+        log_file = os.getenv("LOG_FILE", "logs/health_coach.log")
+        
+        # Create logs directory if it doesn't exist
+        Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+        
+        logging.basicConfig(
+            level=getattr(logging, log_level),
+            format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+            handlers=[
+                logging.FileHandler(log_file),
+                logging.StreamHandler()
+            ]
+        )
     
     logger = logging.getLogger(name)
     return logger
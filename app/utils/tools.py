@@ -3,18 +3,116 @@ Tools for RAG, ontology queries, and recommendations.
 """
 
 import os
+import pickle
+import shutil
+import hashlib
+import tempfile
+import functools
+import threading
+import faiss
+import torch
 import numpy as np
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
+from cachetools import LRUCache
 from sentence_transformers import SentenceTransformer
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from app.utils.logger import logger
 from app.utils.exceptions import RetrievalException, RecommendationException
 from app.ontology.health_ontology import HealthOntology
 
 
+# Memory-map flat vector storage read-only. Only builds with IO_FLAG_MMAP_IFC can map HNSW/Flat
+# storage; older ones (e.g. faiss-cpu 1.8) ignore IO_FLAG_MMAP for these indexes and read them fully
+_FAISS_MMAP_FLAGS = (
+    faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if hasattr(faiss, "IO_FLAG_MMAP_IFC") else None
+)
+
+_torch_threads_configured = False
+
+
+def _configure_torch_threads():
+    """Size torch's CPU thread pools once per process (TORCH_NUM_THREADS, ~cores / uvicorn workers)."""
+    global _torch_threads_configured
+    if _torch_threads_configured:
+        return
+    _torch_threads_configured = True
+    
+    num_threads = int(os.getenv("TORCH_NUM_THREADS", str(min(4, os.cpu_count() or 1))))
+    torch.set_num_threads(num_threads)
+    torch.backends.mkldnn.enabled = True
+    try:
+        # Encoding runs one graph at a time; inter-op threads would only compete with intra-op ones
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before the first parallel op in the process
+        pass
+    logger.info(f"Torch using {num_threads} CPU threads")
+
+
+def _encoder_precision() -> str:
+    """Encoder weight format: int8 (QUANTIZE_ENCODER), bf16 (USE_BF16, for CPUs with native BF16) or fp32."""
+    if os.getenv("QUANTIZE_ENCODER", "false").lower() == "true":
+        return "int8"
+    if os.getenv("USE_BF16", "false").lower() == "true":
+        return "bf16"
+    return "fp32"
+
+
+_encoder_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=4)
+def _load_encoder(model_name: str) -> SentenceTransformer:
+    precision = _encoder_precision()
+    logger.info(f"Loading sentence encoder {model_name} ({precision})")
+    model = SentenceTransformer(model_name, device='cpu')
+    if precision == "int8":
+        # Dynamic int8 quantization of the Linear layers
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if precision == "bf16":
+        # Halves weight bandwidth; cosine ranking over unit-norm embeddings is insensitive to it
+        return model.to(torch.bfloat16)
+    return model
+
+
+def get_encoder(model_name: str) -> SentenceTransformer:
+    """Process-wide sentence encoder per model name, shared by RAGTool and RecommenderTool."""
+    with _encoder_lock:
+        return _load_encoder(model_name)
+
+
+class SharedEncoderEmbeddings(Embeddings):
+    """LangChain embeddings over the shared encoder (same output as HuggingFaceEmbeddings)."""
+    
+    def __init__(self, model_name: str, batch_size: int = 32):
+        self.model_name = model_name
+        self.batch_size = batch_size
+    
+    @property
+    def client(self) -> SentenceTransformer:
+        return get_encoder(self.model_name)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = [text.replace("\n", " ") for text in texts]
+        embeddings = self.client.encode(texts, batch_size=self.batch_size, convert_to_tensor=True)
+        return embeddings.cpu().float().numpy().tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization. Returns (int8 values, float32 scale per row)."""
+    embeddings = np.atleast_2d(embeddings)
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(embeddings / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
 class RAGTool:
     """RAG retrieval using FAISS vector store."""
     
@@ -23,24 +121,46 @@ class RAGTool:
         self.embedding_model_name = embedding_model or os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
         self.chunk_size = int(os.getenv("CHUNK_SIZE", "512"))
         self.top_k = int(os.getenv("TOP_K_RESULTS", "3"))
+        _configure_torch_threads()
         
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=self.embedding_model_name,
-            model_kwargs={'device': 'cpu'}
+        # encode() length-sorts its input before batching, so larger batches add little padding
+        self.embeddings = SharedEncoderEmbeddings(
+            self.embedding_model_name,
+            batch_size=int(os.getenv("ENCODE_BATCH_SIZE", "64"))
         )
         
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=50
+        )
+        
+        # Semantic cache: ring buffer of unit-norm query vectors (allocated once the dimension is known),
+        # each slot paired with (k, results); the write cursor overwrites the oldest entry when full
+        self._qcache_size = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+        self._qcache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+        self._qcache_vecs = None
+        self._qcache_results: List[Tuple[int, List[str]]] = [None] * self._qcache_size
+        self._qcache_count = 0
+        self._qcache_cursor = 0
+        self._qcache_lock = threading.Lock()
+        
+        # Bumped on every add_documents so callers caching retrieval results can key on it
+        self.version = 0
         self.vector_store = None
+        self._index_mmapped = False
         self._load_or_create_vector_store()
     
     def _load_or_create_vector_store(self):
         """Load existing vector store or create with default health documents."""
         try:
-            if Path(self.vector_store_path).exists() and Path(self.vector_store_path + "/index.faiss").exists():
-                self.vector_store = FAISS.load_local(
-                    self.vector_store_path,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
+            index_path = os.path.join(self.vector_store_path, "index.faiss")
+            if os.path.isfile(index_path):
+                # Equivalent to FAISS.load_local, but the index is memory-mapped so pages load on demand
+                # and are shared between worker processes instead of being copied into each heap
+                index = self._read_index(index_path)
+                with open(Path(self.vector_store_path) / "index.pkl", "rb") as f:
+                    docstore, index_to_docstore_id = pickle.load(f)
+                self.vector_store = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
                 logger.info("Vector store loaded")
             else:
                 self._create_default_vector_store()
@@ -48,6 +168,33 @@ class RAGTool:
             logger.error(f"Error loading vector store: {e}")
             self._create_default_vector_store()
     
+    def _read_index(self, index_path: str):
+        """Memory-map the saved index when FAISS supports it, falling back to a regular in-memory read."""
+        self._index_mmapped = False
+        if _FAISS_MMAP_FLAGS is None:
+            return faiss.read_index(index_path)
+        try:
+            index = faiss.read_index(index_path, _FAISS_MMAP_FLAGS)
+            self._index_mmapped = True
+            return index
+        except Exception as e:
+            # e.g. an index format without mmap support; never rebuild over a readable index
+            logger.warning(f"Could not memory-map vector index, loading it into memory: {e}")
+            return faiss.read_index(index_path)
+    
+    def _save_vector_store(self):
+        """Save the store atomically, so other workers never map a partially written index."""
+        Path(self.vector_store_path).mkdir(parents=True, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".save-", dir=self.vector_store_path)
+        try:
+            self.vector_store.save_local(tmp_dir)
+            # Docstore first: until index.faiss is swapped, readers see a superset of the ids they need.
+            # Replacing (not rewriting) the file leaves existing mappings on the old inode
+            for name in ("index.pkl", "index.faiss"):
+                os.replace(os.path.join(tmp_dir, name), os.path.join(self.vector_store_path, name))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    
     def _create_default_vector_store(self):
         """Create vector store with default health knowledge."""
         default_docs = [
@@ -66,22 +213,27 @@ class RAGTool:
         try:
             Path(self.vector_store_path).mkdir(parents=True, exist_ok=True)
             
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=self.chunk_size,
-                chunk_overlap=50
-            )
-            
             chunks = []
             for doc in default_docs:
-                chunks.extend(text_splitter.split_text(doc))
+                chunks.extend(self._splitter.split_text(doc))
             
             self.vector_store = FAISS.from_texts(chunks, self.embeddings)
-            self.vector_store.save_local(self.vector_store_path)
+            self._use_hnsw_index()
+            self._save_vector_store()
             logger.info("Default vector store created")
         except Exception as e:
             logger.error(f"Error creating vector store: {e}")
             raise RetrievalException(f"Failed to create vector store: {e}")
     
+    def _use_hnsw_index(self):
+        """Swap the flat L2 index for an HNSW graph index so search cost grows ~log N with the corpus."""
+        flat_index = self.vector_store.index
+        hnsw_index = faiss.IndexHNSWFlat(flat_index.d, int(os.getenv("FAISS_HNSW_M", "32")))
+        hnsw_index.hnsw.efSearch = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+        # Same insertion order, so LangChain's position -> docstore id mapping still holds
+        hnsw_index.add(flat_index.reconstruct_n(0, flat_index.ntotal))
+        self.vector_store.index = hnsw_index
+    
     def retrieve(self, query: str, k: int = None) -> List[str]:
         """Retrieve top-k relevant documents."""
         if not self.vector_store:
@@ -89,30 +241,76 @@ class RAGTool:
         
         try:
             k = k or self.top_k
-            docs = self.vector_store.similarity_search(query, k=k)
-            return [doc.page_content for doc in docs]
+            query_embedding = self.embeddings.embed_query(query)
+            query_unit = np.asarray(query_embedding, dtype=np.float32)
+            query_unit /= np.linalg.norm(query_unit) or 1.0
+            
+            cached = self._semantic_cache_get(query_unit, k)
+            if cached is not None:
+                return cached
+            
+            docs = self.vector_store.similarity_search_by_vector(query_embedding, k=k)
+            results = [doc.page_content for doc in docs]
+            self._semantic_cache_put(query_unit, k, results)
+            return list(results)
         except Exception as e:
             logger.error(f"Retrieval error: {e}")
             raise RetrievalException(f"Failed to retrieve documents: {e}")
     
+    def _semantic_cache_get(self, query_embedding: np.ndarray, k: int):
+        """Return results cached for a near-duplicate query (cosine >= threshold) with the same k."""
+        with self._qcache_lock:
+            if self._qcache_count == 0:
+                return None
+            similarities = self._qcache_vecs[:self._qcache_count] @ query_embedding
+            for idx in np.argsort(-similarities):
+                if similarities[idx] < self._qcache_threshold:
+                    break
+                cached_k, results = self._qcache_results[idx]
+                if cached_k == k:
+                    return list(results)
+        return None
+    
+    def _semantic_cache_put(self, query_embedding: np.ndarray, k: int, results: List[str]):
+        """Remember results for a query vector, overwriting the oldest entry when full."""
+        if self._qcache_size <= 0:
+            return
+        with self._qcache_lock:
+            if self._qcache_vecs is None:
+                self._qcache_vecs = np.empty((self._qcache_size, len(query_embedding)), dtype=np.float32)
+            self._qcache_vecs[self._qcache_cursor] = query_embedding
+            self._qcache_results[self._qcache_cursor] = (k, results)
+            self._qcache_cursor = (self._qcache_cursor + 1) % self._qcache_size
+            self._qcache_count = min(self._qcache_count + 1, self._qcache_size)
+    
+    def _semantic_cache_clear(self):
+        """Drop cached results, e.g. after the corpus changes."""
+        with self._qcache_lock:
+            self._qcache_results = [None] * self._qcache_size
+            self._qcache_count = 0
+            self._qcache_cursor = 0
+    
     def add_documents(self, documents: List[str]):
         """Add new documents to vector store."""
         try:
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=self.chunk_size,
-                chunk_overlap=50
-            )
-            
-            chunks = []
-            for doc in documents:
-                chunks.extend(text_splitter.split_text(doc))
+            chunks = [chunk for doc in documents for chunk in self._splitter.split_text(doc)]
+            # One batched encode for every chunk, handed to FAISS as precomputed vectors
+            text_embeddings = list(zip(chunks, self.embeddings.embed_documents(chunks)))
             
             if self.vector_store:
-                self.vector_store.add_texts(chunks)
+                if self._index_mmapped:
+                    # A read-only mapped index cannot grow; copy the loaded index (not the file on disk, which
+                    # another worker may have replaced) so it stays aligned with this store's docstore ids
+                    self.vector_store.index = faiss.deserialize_index(faiss.serialize_index(self.vector_store.index))
+                    self._index_mmapped = False
+                self.vector_store.add_embeddings(text_embeddings)
             else:
-                self.vector_store = FAISS.from_texts(chunks, self.embeddings)
+                self.vector_store = FAISS.from_embeddings(text_embeddings, self.embeddings)
+                self._use_hnsw_index()
             
-            self.vector_store.save_local(self.vector_store_path)
+            self._save_vector_store()
+            self._semantic_cache_clear()
+            self.version += 1
             logger.info(f"Added {len(chunks)} chunks to vector store")
         except Exception as e:
             logger.error(f"Error adding documents: {e}")
@@ -124,11 +322,19 @@ class OntologyTool:
     
     def __init__(self):
         self.ontology = HealthOntology()
+        # Memoized per normalized concept set; agent loops keep asking about the same few concepts
+        self._cached_query = functools.lru_cache(maxsize=int(os.getenv("ONTOLOGY_CACHE_SIZE", "1024")))(self._query_inner)
+    
+    def _query_inner(self, key: Tuple[str, ...]) -> Dict[str, Any]:
+        return self.ontology.query_ontology(list(key))
     
     def query(self, concepts: List[str]) -> Dict[str, Any]:
         """Query ontology for concept relationships."""
         try:
-            return self.ontology.query_ontology(concepts)
+            terms = [concept.lower() for concept in concepts]
+            cached = self._cached_query(tuple(sorted(set(terms))))
+            # Fresh dict in the caller's term order, so the cached one is never mutated or reordered
+            return {term: cached[term] for term in dict.fromkeys(terms) if term in cached}
         except Exception as e:
             logger.error(f"Ontology query error: {e}")
             return {}
@@ -139,8 +345,9 @@ class RecommenderTool:
     
     def __init__(self, model_name: str = None):
         self.model_name = model_name or os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-        self.model = SentenceTransformer(self.model_name, device='cpu')
         self.similarity_threshold = float(os.getenv("SIMILARITY_THRESHOLD", "0.7"))
+        self.encode_batch_size = int(os.getenv("ENCODE_BATCH_SIZE", "64"))
+        _configure_torch_threads()
         
         self.recommendation_templates = [
             "Increase water intake to 2-3 liters daily to boost energy and reduce fatigue",
@@ -154,6 +361,69 @@ class RecommenderTool:
             "Maintain consistent sleep schedule to regulate circadian rhythm",
             "Balance cardio and strength training for comprehensive fitness"
         ]
+        
+        # Unit-norm embeddings: templates are encoded once, other texts on first use
+        self._embedding_cache = LRUCache(maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")))
+        self._embedding_cache_lock = threading.Lock()
+        self._template_embeddings = self._load_template_embeddings()
+        
+        # Optional int8 scoring: a quarter of the FP32 bandwidth on large candidate pools, ~1e-3 score error
+        self.use_int8 = os.getenv("USE_INT8_EMBEDDINGS", "false").lower() == "true"
+        if self.use_int8:
+            self._template_int8 = _quantize_int8(self._template_embeddings)
+    
+    @property
+    def model(self) -> SentenceTransformer:
+        """Shared sentence encoder, loaded on first use (template embeddings usually come from disk)."""
+        return get_encoder(self.model_name)
+    
+    def _load_template_embeddings(self) -> np.ndarray:
+        """Memory-map the template embedding matrix, encoding and saving it on first run."""
+        encoder_id = f"{self.model_name}|{_encoder_precision()}"
+        key = hashlib.sha1("\n".join([encoder_id, *self.recommendation_templates]).encode()).hexdigest()[:12]
+        path = Path(os.getenv("VECTOR_STORE_PATH", "data/vector_store/")) / f"template_embeddings_{key}.npy"
+        
+        try:
+            return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            pass
+        
+        embeddings = self._encode_cached(self.recommendation_templates)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, embeddings)
+            os.replace(tmp_path, path)
+            logger.info(f"Template embeddings saved to {path}")
+            return np.load(path, mmap_mode="r")
+        except OSError as e:
+            logger.warning(f"Could not persist template embeddings: {e}")
+            return embeddings
+    
+    def _encode_cached(self, texts: List[str]) -> np.ndarray:
+        """Return unit-norm embeddings for texts, batch-encoding only the ones not cached yet."""
+        with self._embedding_cache_lock:
+            cached = [self._embedding_cache.get(text) for text in texts]
+        
+        missing = list(dict.fromkeys(text for text, emb in zip(texts, cached) if emb is None))
+        if missing:
+            # One stacked tensor, viewed as numpy without a copy (convert_to_numpy copies row by row);
+            # float() is a no-op for fp32 and upcasts bf16 output
+            embeddings = self.model.encode(
+                missing,
+                batch_size=self.encode_batch_size,
+                convert_to_tensor=True,
+                normalize_embeddings=True
+            ).cpu().float().numpy()
+            encoded = dict(zip(missing, embeddings))
+            with self._embedding_cache_lock:
+                for text, emb in encoded.items():
+                    emb.setflags(write=False)
+                    self._embedding_cache[text] = emb
+            cached = [encoded[text] if emb is None else emb for text, emb in zip(texts, cached)]
+        
+        return np.stack(cached)
     
     def get_personalized_recommendations(
         self,
@@ -163,39 +433,42 @@ class RecommenderTool:
     ) -> List[Tuple[str, float]]:
         """Generate personalized recommendations using embedding similarity."""
         try:
-            candidates = candidate_recommendations or self.recommendation_templates
-            
-            user_embedding = self.model.encode(user_context, convert_to_numpy=True)
-            candidate_embeddings = self.model.encode(candidates, convert_to_numpy=True)
+            if candidate_recommendations:
+                candidates = candidate_recommendations
+                candidate_embeddings = self._encode_cached(candidates)
+            else:
+                candidates = self.recommendation_templates
+                candidate_embeddings = self._template_embeddings
             
-            similarities = np.dot(candidate_embeddings, user_embedding) / (
-                np.linalg.norm(candidate_embeddings, axis=1) * np.linalg.norm(user_embedding)
-            )
+            similarities = self._similarities(candidates, candidate_embeddings, self._encode_query(user_context))
             
-            filtered_indices = np.where(similarities >= self.similarity_threshold)[0]
+            # Partition out the best top_n (O(N)) and sort only those. Candidates above the threshold
+            # rank first, so keep just those when there are any, else fall back to the best top_n
+            top_n = min(top_n, len(similarities))
+            top_indices = np.argpartition(-similarities, top_n - 1)[:top_n]
+            top_indices = top_indices[np.argsort(-similarities[top_indices], kind="stable")]
+            above_threshold = top_indices[similarities[top_indices] >= self.similarity_threshold]
+            if len(above_threshold) > 0:
+                top_indices = above_threshold
             
-            if len(filtered_indices) == 0:
-                top_indices = np.argsort(similarities)[-top_n:][::-1]
-            else:
-                sorted_filtered = sorted(filtered_indices, key=lambda i: similarities[i], reverse=True)
-                top_indices = sorted_filtered[:top_n]
-            
-            # Add diversity: avoid too similar recommendations
+            # Add diversity: avoid too similar recommendations (embeddings are unit-norm, so dot = cosine)
             selected_recs = []
+            selected_indices = []
             for idx in top_indices:
                 rec = candidates[idx]
                 score = float(similarities[idx])
                 
                 # Check diversity
                 is_diverse = True
-                for existing_rec, _ in selected_recs:
-                    similarity = self._compute_similarity(rec, existing_rec)
+                for existing_idx in selected_indices:
+                    similarity = float(candidate_embeddings[idx] @ candidate_embeddings[existing_idx])
                     if similarity > 0.85:
                         is_diverse = False
                         break
                 
                 if is_diverse:
                     selected_recs.append((rec, score))
+                    selected_indices.append(idx)
                 
                 if len(selected_recs) >= top_n:
                     break
@@ -205,8 +478,29 @@ class RecommenderTool:
             logger.error(f"Recommendation error: {e}")
             raise RecommendationException(f"Failed to generate recommendations: {e}")
     
-    def _compute_similarity(self, text1: str, text2: str) -> float:
-        """Compute cosine similarity between two texts."""
-        emb1 = self.model.encode(text1, convert_to_numpy=True)
-        emb2 = self.model.encode(text2, convert_to_numpy=True)
-        return float(np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2)))
\ No newline at end of file
+    def _encode_query(self, user_context: str) -> np.ndarray:
+        """Encode the user context as a unit-norm float32 vector, whatever precision the encoder runs in."""
+        return self.model.encode(
+            user_context,
+            convert_to_tensor=True,
+            normalize_embeddings=True
+        ).cpu().float().numpy()
+    
+    def _similarities(self, candidates: List[str], candidate_embeddings: np.ndarray, user_embedding: np.ndarray) -> np.ndarray:
+        """Cosine scores of unit-norm candidates against the user embedding, in int8 when enabled."""
+        if not self.use_int8:
+            return candidate_embeddings @ user_embedding
+        if candidates is self.recommendation_templates:
+            quantized_candidates = self._template_int8
+        else:
+            quantized_candidates = _quantize_int8(candidate_embeddings)
+        return self._int8_similarities(quantized_candidates, user_embedding)
+    
+    def _int8_similarities(
+        self, quantized_candidates: Tuple[np.ndarray, np.ndarray], user_embedding: np.ndarray
+    ) -> np.ndarray:
+        """Approximate cosine scores from int8 candidates: int32-accumulated dot product, rescaled."""
+        candidate_values, candidate_scales = quantized_candidates
+        (user_values,), (user_scale,) = _quantize_int8(user_embedding)
+        dots = candidate_values.astype(np.int32) @ user_values.astype(np.int32)
+        return dots * candidate_scales * user_scale
\ No newline at end of file
@@ -8,6 +8,7 @@ from app.models.schemas import AgentState
 from app.agents.analyzer_agent import AnalyzerAgent
 from app.agents.retriever_agent import RetrieverAgent
 from app.agents.recommender_agent import RecommenderAgent
+from app.agents.supervisor import SupervisorWorkflow
 
 
 @pytest.fixture
@@ -73,6 +74,8 @@ class TestAnalyzerAgent:
         result = agent.analyze(empty_state)
         
         assert result.analysis is not None
+        assert result.next_agent == "retriever"
+        mock_groq.return_value.invoke.assert_not_called()
 
 
 class TestRetrieverAgent:
@@ -113,6 +116,40 @@ class TestRetrieverAgent:
         
         assert len(result.retrieved_context) > 0
         assert result.next_agent == "recommender"
+    
+    @patch('app.agents.retriever_agent.RAGTool')
+    @patch('app.agents.retriever_agent.OntologyTool')
+    @patch('app.agents.retriever_agent.ChatGroq')
+    def test_retriever_act_caches_by_terms(self, mock_groq, mock_ontology, mock_rag, sample_state):
+        """Test repeated query terms are served from the retrieval cache."""
+        mock_rag.return_value.retrieve.return_value = ["Sleep 7-9 hours for health"]
+        mock_ontology.return_value.query.return_value = {"sleep": {"influences": ["energy"]}}
+        
+        agent = RetrieverAgent()
+        first = agent._act(["sleep", "hydration"], sample_state)
+        second = agent._act(["hydration", "sleep"], sample_state)
+        
+        assert first == second
+        assert mock_rag.return_value.retrieve.call_count == 1
+        assert mock_ontology.return_value.query.call_count == 1
+    
+    @patch('app.agents.retriever_agent.RAGTool')
+    @patch('app.agents.retriever_agent.OntologyTool')
+    @patch('app.agents.retriever_agent.ChatGroq')
+    def test_retriever_cache_invalidated_by_new_documents(self, mock_groq, mock_ontology, mock_rag, sample_state):
+        """Test adding documents to the RAG store bypasses previously cached results."""
+        mock_rag.return_value.version = 0
+        mock_rag.return_value.retrieve.return_value = ["Sleep 7-9 hours for health"]
+        mock_ontology.return_value.query.return_value = {"sleep": {"influences": ["energy"]}}
+        
+        agent = RetrieverAgent()
+        agent._act(["sleep"], sample_state)
+        mock_rag.return_value.version = 1
+        mock_rag.return_value.retrieve.return_value = ["Naps under 30 minutes aid alertness"]
+        rag_results, _ = agent._act(["sleep"], sample_state)
+        
+        assert rag_results == ["Naps under 30 minutes aid alertness"]
+        assert mock_rag.return_value.retrieve.call_count == 2
 
 
 class TestRecommenderAgent:
@@ -138,6 +175,7 @@ class TestRecommenderAgent:
 REASONING: Better sleep improves energy and mood
 CATEGORY: sleep"""
         mock_groq.return_value.invoke.return_value = mock_response
+        mock_groq.return_value.stream.return_value = []
         
         mock_rec_tool.return_value.get_personalized_recommendations.return_value = [
             ("Aim for 7-9 hours of sleep", 0.85)
@@ -151,6 +189,76 @@ CATEGORY: sleep"""
         assert result.recommendations[0]["reasoning"] is not None
         assert result.next_agent is None
     
+    @patch('app.agents.recommender_agent.RecommenderTool')
+    @patch('app.agents.recommender_agent.ChatGroq')
+    def test_recommender_recommend_stream(self, mock_groq, mock_rec_tool, sample_state):
+        """Test recommender yields each recommendation while the batched response is still streaming."""
+        sample_state.analysis = "User needs better sleep and hydration"
+        sample_state.retrieved_context = ["Sleep is important for health"]
+        
+        response = """[1]
+RECOMMENDATION: Aim for 7-9 hours of sleep nightly
+REASONING: Better sleep improves energy and mood
+CATEGORY: sleep
+[2]
+RECOMMENDATION: Drink 2 liters of water daily
+REASONING: Hydration reduces fatigue
+CATEGORY: hydration"""
+        chunks = [response[i:i + 7] for i in range(0, len(response), 7)]
+        sent = []
+        
+        def stream(prompt, **kwargs):
+            for chunk in chunks:
+                sent.append(chunk)
+                yield Mock(content=chunk)
+        
+        mock_groq.return_value.stream.side_effect = stream
+        mock_groq.return_value.invoke.return_value = Mock(content="Focus on sleep and hydration")
+        
+        mock_rec_tool.return_value.get_personalized_recommendations.return_value = [
+            ("Aim for 7-9 hours of sleep", 0.85),
+            ("Increase water intake", 0.8)
+        ]
+        
+        agent = RecommenderAgent()
+        recs = agent.recommend_stream(sample_state)
+        first = next(recs)
+        
+        assert first["category"] == "sleep"
+        assert len(sent) < len(chunks)
+        streamed = [first] + list(recs)
+        assert [rec["category"] for rec in streamed] == ["sleep", "hydration"]
+        assert sample_state.recommendations == streamed
+        assert sample_state.next_agent is None
+        assert mock_groq.return_value.invoke.call_count == 1
+    
+    @patch('app.agents.recommender_agent.RecommenderTool')
+    @patch('app.agents.recommender_agent.ChatGroq')
+    def test_recommender_retries_items_missing_from_stream(self, mock_groq, mock_rec_tool, sample_state):
+        """Test only the items a failed batched stream did not cover are personalized individually."""
+        sample_state.analysis = "User needs better sleep and hydration"
+        sample_state.retrieved_context = ["Sleep is important for health"]
+        
+        def stream(prompt, **kwargs):
+            yield Mock(content="[1]\nRECOMMENDATION: Sleep 8 hours\nREASONING: Recovery\nCATEGORY: sleep\n[2]\nRECOMM")
+            raise ConnectionError("stream dropped")
+        
+        mock_groq.return_value.stream.side_effect = stream
+        mock_groq.return_value.invoke.return_value = Mock(content="""RECOMMENDATION: Drink 2 liters of water daily
+REASONING: Hydration reduces fatigue
+CATEGORY: hydration""")
+        
+        mock_rec_tool.return_value.get_personalized_recommendations.return_value = [
+            ("Aim for 7-9 hours of sleep", 0.85),
+            ("Increase water intake", 0.8)
+        ]
+        
+        agent = RecommenderAgent()
+        result = agent.recommend(sample_state)
+        
+        assert [rec["category"] for rec in result.recommendations] == ["sleep", "hydration"]
+        assert mock_groq.return_value.invoke.call_count == 2
+    
     def test_parse_llm_response(self):
         """Test LLM response parsing."""
         agent = RecommenderAgent()
@@ -163,4 +271,71 @@ CATEGORY: hydration"""
         
         assert parsed["recommendation"] == "Drink more water"
         assert parsed["reasoning"] == "Prevents dehydration"
-        assert parsed["category"] == "hydration"
\ No newline at end of file
+        assert parsed["category"] == "hydration"
+    
+    @patch('app.agents.recommender_agent.RecommenderTool')
+    @patch('app.agents.recommender_agent.ChatGroq')
+    def test_parse_batch_response(self, mock_groq, mock_rec_tool):
+        """Test batched LLM response parsing by index."""
+        agent = RecommenderAgent()
+        
+        response = """[1]
+RECOMMENDATION: Drink more water
+REASONING: Prevents dehydration
+CATEGORY: hydration
+[2]
+RECOMMENDATION: Sleep 8 hours
+REASONING: Improves recovery
+CATEGORY: Sleep"""
+        
+        parsed = agent._parse_batch_response(response)
+        
+        assert set(parsed) == {1, 2}
+        assert parsed[1]["recommendation"] == "Drink more water"
+        assert parsed[2]["category"] == "sleep"
+
+
+class TestSupervisorWorkflow:
+    """Tests for SupervisorWorkflow."""
+    
+    @patch('app.agents.supervisor.RecommenderAgent')
+    @patch('app.agents.supervisor.RetrieverAgent')
+    @patch('app.agents.supervisor.AnalyzerAgent')
+    @patch('app.agents.supervisor.ChatGroq')
+    def test_execute_stream_matches_graph(self, mock_groq, mock_analyzer, mock_retriever, mock_recommender):
+        """Test the streaming path visits the same agents and yields the graph's recommendations."""
+        rec = {"text": "Sleep 8 hours", "category": "sleep"}
+        
+        def analyze(state):
+            state.analysis = "Low sleep"
+            state.reasoning_trace = state.reasoning_trace + ["analyzed"]
+            state.next_agent = "retriever"
+            return state
+        
+        def retrieve(state):
+            state.retrieved_context = ["Sleep matters"]
+            state.next_agent = "recommender"
+            return state
+        
+        def recommend(state):
+            state.recommendations = [rec]
+            state.next_agent = None
+            return state
+        
+        def recommend_stream(state):
+            yield rec
+            state.recommendations = [rec]
+            state.next_agent = None
+        
+        mock_analyzer.return_value.analyze.side_effect = analyze
+        mock_retriever.return_value.retrieve.side_effect = retrieve
+        mock_recommender.return_value.recommend.side_effect = recommend
+        mock_recommender.return_value.recommend_stream.side_effect = recommend_stream
+        
+        workflow = SupervisorWorkflow()
+        result = workflow.execute("test_user", "Help me sleep", {})
+        streamed = list(workflow.execute_stream("test_user", "Help me sleep", {}))
+        
+        assert result["recommendations"] == [rec]
+        assert streamed == [("suggestion", rec), ("reasoning", result["reasoning_trace"])]
+        assert mock_retriever.return_value.retrieve.call_count == 2
\ No newline at end of file
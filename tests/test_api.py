@@ -2,6 +2,7 @@
 Unit tests for FastAPI endpoints.
 """
 
+import json
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import Mock, patch
@@ -187,4 +188,44 @@ def test_get_logs_empty(client, mock_db):
     
     response = client.get("/logs/test_user")
     assert response.status_code == 200
-    assert response.json()["count"] == 0
\ No newline at end of file
+    assert response.json()["count"] == 0
+
+
+def test_stream_suggestions_events_and_storage(mock_db, mock_supervisor):
+    """Test SSE framing of streamed suggestions and that they are stored afterwards."""
+    mock_db.get_user_logs.return_value = [{"activity_minutes": 30, "sleep_hours": 7.0}]
+    mock_db.get_user_profile.return_value = None
+    
+    mock_supervisor.execute_stream.return_value = iter([
+        ("suggestion", {
+            "suggestion_id": "123",
+            "user_id": "test_user",
+            "timestamp": datetime.now().isoformat(),
+            "category": "sleep",
+            "text": "Get more sleep",
+            "reasoning": "Sleep is important",
+            "confidence_score": 0.85,
+            "source": "system"
+        }),
+        ("reasoning", ["Step 1", "Step 2"])
+    ])
+    
+    payload = {
+        "user_id": "test_user",
+        "query": "Give me recommendations"
+    }
+    
+    with TestClient(app) as client:
+        response = client.post("/get_suggestion/stream", json=payload)
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    
+    events = [block.split("\n", 1) for block in response.text.split("\n\n") if block]
+    assert [event for event, _ in events] == ["event: suggestion", "event: reasoning"]
+    assert json.loads(events[0][1].removeprefix("data: "))["suggestion_id"] == "123"
+    assert json.loads(events[1][1].removeprefix("data: ")) == ["Step 1", "Step 2"]
+    
+    mock_db.insert_suggestions.assert_called_once()
+    stored = mock_db.insert_suggestions.call_args[0][0]
+    assert [suggestion.suggestion_id for suggestion in stored] == ["123"]
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Unit tests for database operations.
+"""
+
+import sqlite3
+import pytest
+from datetime import datetime, timedelta, timezone
+from app.models.schemas import UserLog, UserProfile
+from app.data.db import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Database backed by a temporary file."""
+    database = Database(str(tmp_path / "health_coach.db"))
+    yield database
+    database.close()
+
+
+def test_user_log_round_trip(db):
+    """Test logs are stored as unix millis and read back as ISO strings."""
+    timestamp = datetime(2024, 1, 2, 10, 0, 0, 123000)
+    db.insert_user_log(UserLog(user_id="test_user", timestamp=timestamp, sleep_hours=7.5))
+    
+    logs = db.get_user_logs("test_user")
+    
+    assert len(logs) == 1
+    assert datetime.fromisoformat(logs[0]["timestamp"]) == timestamp.astimezone()
+    assert logs[0]["sleep_hours"] == 7.5
+
+
+def test_aware_timestamp_round_trip(db):
+    """Test aware timestamps read back as the same instant, in UTC."""
+    timestamp = datetime(2024, 1, 2, 10, 0, 0, 123000, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    db.insert_user_log(UserLog(user_id="test_user", timestamp=timestamp, sleep_hours=7.5))
+    
+    logs = db.get_user_logs("test_user")
+    
+    assert logs[0]["timestamp"] == "2024-01-02T04:30:00.123000+00:00"
+    assert datetime.fromisoformat(logs[0]["timestamp"]) == timestamp
+
+
+def test_user_profile_upsert_round_trip(db):
+    """Test a profile is created, updated in place and read back with its list fields intact."""
+    db.upsert_user_profile(UserProfile(
+        user_id="test_user", age=30, weight_kg=70.5, health_goals=["sleep better", "run 5k"], medical_conditions=[]
+    ))
+    db.upsert_user_profile(UserProfile(
+        user_id="test_user", age=31, weight_kg=68.0, height_cm=175.0,
+        health_goals=["run 10k"], medical_conditions=["asthma"]
+    ))
+    
+    profile = db.get_user_profile("test_user")
+    
+    assert profile == {
+        "user_id": "test_user", "age": 31, "weight_kg": 68.0, "height_cm": 175.0,
+        "health_goals": ["run 10k"], "medical_conditions": ["asthma"]
+    }
+    assert db.get_user_profile("other_user") is None
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM user_profiles").fetchone()[0] == 1
+    conn.close()
+
+
+def test_migrates_text_timestamps(tmp_path):
+    """Test tables created with ISO TEXT timestamps are converted on startup."""
+    db_path = str(tmp_path / "legacy.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE user_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                activity_minutes INTEGER,
+                sleep_hours REAL,
+                water_intake_ml INTEGER,
+                calories INTEGER,
+                heart_rate INTEGER,
+                steps INTEGER,
+                mood TEXT
+            )
+        """)
+        conn.execute(
+            "INSERT INTO user_logs (user_id, timestamp, sleep_hours) VALUES (?, ?, ?)",
+            ("test_user", "2024-01-02T10:00:00", 7.0)
+        )
+    conn.close()
+    
+    db = Database(db_path)
+    logs = db.get_user_logs("test_user")
+    db.close()
+    
+    assert datetime.fromisoformat(logs[0]["timestamp"]) == datetime(2024, 1, 2, 10, 0, 0).astimezone()
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT typeof(timestamp) FROM user_logs").fetchone()[0] == "integer"
+    conn.close()
\ No newline at end of file
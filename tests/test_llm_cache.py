@@ -0,0 +1,57 @@
+"""
+Unit tests for the LLM response cache.
+"""
+
+from langchain_core.outputs import Generation
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from app.utils.llm_cache import LRULLMCache
+
+
+def _generations(text):
+    """Cache value holding a single generation."""
+    return [Generation(text=text)]
+
+
+def test_lookup_and_update():
+    """Test entries are keyed by both prompt and LLM settings."""
+    cache = LRULLMCache(maxsize=2)
+    assert cache.lookup("prompt", "llm-a") is None
+    
+    cache.update("prompt", "llm-a", _generations("first"))
+    cache.update("prompt", "llm-a", _generations("second"))
+    
+    assert cache.lookup("prompt", "llm-a") == _generations("second")
+    assert cache.lookup("prompt", "llm-b") is None
+    assert len(cache._cache) == 1
+
+
+def test_evicts_least_recently_used():
+    """Test maxsize is enforced and lookups refresh recency."""
+    cache = LRULLMCache(maxsize=2)
+    cache.update("a", "llm", _generations("a"))
+    cache.update("b", "llm", _generations("b"))
+    
+    cache.lookup("a", "llm")
+    cache.update("c", "llm", _generations("c"))
+    
+    assert cache.lookup("b", "llm") is None
+    assert cache.lookup("a", "llm") == _generations("a")
+    assert cache.lookup("c", "llm") == _generations("c")
+    assert len(cache._cache) == 2
+
+
+def test_clear():
+    """Test clear drops every entry."""
+    cache = LRULLMCache()
+    cache.update("a", "llm", _generations("a"))
+    cache.clear()
+    assert cache.lookup("a", "llm") is None
+
+
+def test_chat_model_uses_instance_cache():
+    """Test a model given cache= answers repeated prompts from it."""
+    llm = FakeListChatModel(responses=["first", "second"], cache=LRULLMCache())
+    
+    assert llm.invoke("hello").content == "first"
+    assert llm.invoke("hello").content == "first"
+    assert llm.invoke("goodbye").content == "second"
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+Unit tests for the health ontology.
+"""
+
+import networkx as nx
+import pytest
+from app.ontology.health_ontology import HealthOntology
+
+
+@pytest.fixture(scope="module")
+def ontology():
+    """Shared ontology instance (read-only once built)."""
+    return HealthOntology()
+
+
+def test_related_concepts_known_answers(ontology):
+    """Test related concepts include both descendants and ancestors."""
+    assert ontology.get_related_concepts("inflammation") == {"recovery", "endurance", "energy"}
+    assert ontology.get_related_concepts("weight") == {"nutrition", "heart_health", "blood_pressure"}
+    assert ontology.get_related_concepts("unknown") == set()
+
+
+def test_related_concepts_match_networkx(ontology):
+    """Test the precomputed closure matches NetworkX descendants | ancestors for every concept."""
+    for concept in ontology.graph:
+        expected = nx.descendants(ontology.graph, concept) | nx.ancestors(ontology.graph, concept)
+        assert ontology.get_related_concepts(concept) == expected, concept
+
+
+def test_direct_influences_keep_edge_order(ontology):
+    """Test direct influences follow edge insertion order."""
+    assert ontology.get_influence_concepts("sleep") == ["energy", "mood", "recovery", "immune_system", "mental_clarity"]
+    assert ontology.get_influencing_concepts("sleep") == ["exercise", "stress"]
+    assert ontology.get_influence_concepts("unknown") == []
+
+
+def test_path_lengths(ontology):
+    """Test shortest paths over the undirected graph."""
+    assert len(ontology.get_path_between("hydration", "blood_pressure")) == 5
+    assert ontology.get_path_between("sleep", "mood") == ["sleep", "mood"]
+    assert ontology.get_path_between("sleep", "sleep") == ["sleep"]
+    assert ontology.get_path_between("sleep", "unknown") == []
+    
+    undirected = ontology.graph.to_undirected()
+    for source in ("hydration", "inflammation", "blood_pressure"):
+        for target in ontology.graph:
+            expected = nx.shortest_path_length(undirected, source, target) + 1
+            assert len(ontology.get_path_between(source, target)) == expected, (source, target)
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""
+Unit tests for RAG and recommendation tools.
+"""
+
+import os
+import hashlib
+import faiss
+import numpy as np
+import pytest
+import torch
+from unittest.mock import Mock, patch
+from langchain_core.embeddings import Embeddings
+from app.utils.tools import RAGTool, RecommenderTool
+
+
+class FakeEncoder:
+    """Deterministic bag-of-words encoder standing in for SentenceTransformer."""
+    
+    dim = 64
+    
+    def __init__(self):
+        self.encoded = []
+    
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            digest = int(hashlib.md5(word.encode()).hexdigest(), 16)
+            vector[digest % self.dim] += 1.0 + (digest >> 8) % 3
+        return vector
+    
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, convert_to_tensor=False, normalize_embeddings=False):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        self.encoded.extend(texts)
+        embeddings = np.stack([self._embed(text) for text in texts])
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        if single:
+            embeddings = embeddings[0]
+        return torch.from_numpy(embeddings) if convert_to_tensor else embeddings
+
+
+class FakeEmbeddings(Embeddings):
+    """LangChain embeddings over FakeEncoder, standing in for SharedEncoderEmbeddings."""
+    
+    def __init__(self):
+        self.encoder = FakeEncoder()
+    
+    def embed_documents(self, texts):
+        return [self.encoder._embed(text).tolist() for text in texts]
+    
+    def embed_query(self, text):
+        return self.encoder._embed(text).tolist()
+
+
+def _reference_recommendations(encoder, user_context, candidates, top_n, threshold):
+    """The original loop: full sort, Python-level filtering and pairwise diversity checks."""
+    def cosine(a, b):
+        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+    
+    user_embedding = encoder._embed(user_context)
+    candidate_embeddings = [encoder._embed(text) for text in candidates]
+    similarities = np.array([cosine(emb, user_embedding) for emb in candidate_embeddings])
+    
+    filtered_indices = np.where(similarities >= threshold)[0]
+    if len(filtered_indices) == 0:
+        top_indices = np.argsort(similarities)[-top_n:][::-1]
+    else:
+        top_indices = sorted(filtered_indices, key=lambda i: similarities[i], reverse=True)[:top_n]
+    
+    selected = []
+    for idx in top_indices:
+        if all(cosine(candidate_embeddings[idx], encoder._embed(text)) <= 0.85 for text, _ in selected):
+            selected.append((candidates[idx], float(similarities[idx])))
+        if len(selected) >= top_n:
+            break
+    return selected
+
+
+@pytest.fixture
+def encoder(tmp_path, monkeypatch):
+    """Fake shared encoder, with template embeddings persisted under a temporary directory."""
+    monkeypatch.setenv("VECTOR_STORE_PATH", str(tmp_path))
+    fake = FakeEncoder()
+    with patch('app.utils.tools.get_encoder', return_value=fake):
+        yield fake
+
+
+def _assert_same(result, expected, tolerance=1e-5):
+    assert [text for text, _ in result] == [text for text, _ in expected]
+    assert [score for _, score in result] == pytest.approx([score for _, score in expected], abs=tolerance)
+
+
+@pytest.mark.parametrize("threshold", [0.7, 0.3])
+@pytest.mark.parametrize("top_n", [3, 6])
+def test_template_recommendations_match_reference(encoder, threshold, top_n):
+    """Test vectorized top-N selection matches the original loop on the template set."""
+    tool = RecommenderTool()
+    tool.similarity_threshold = threshold
+    context = "User sleeps 5 hours, drinks little water, low exercise and high stress"
+    
+    result = tool.get_personalized_recommendations(context, top_n=top_n)
+    
+    _assert_same(result, _reference_recommendations(encoder, context, tool.recommendation_templates, top_n, threshold))
+
+
+def test_custom_candidates_apply_diversity(encoder):
+    """Test near-duplicate candidates are dropped the same way as the original loop."""
+    tool = RecommenderTool()
+    tool.similarity_threshold = 0.1
+    candidates = ["Drink water often", "Drink more water often", "Sleep early every night", "Walk daily"]
+    
+    result = tool.get_personalized_recommendations("drink water and sleep", candidates, top_n=3)
+    
+    _assert_same(result, _reference_recommendations(encoder, "drink water and sleep", candidates, 3, 0.1))
+    assert "Drink more water often" not in [text for text, _ in result]
+
+
+def test_int8_scoring_matches_reference(encoder, monkeypatch):
+    """Test int8 scoring keeps the ranking with small score error."""
+    monkeypatch.setenv("USE_INT8_EMBEDDINGS", "true")
+    tool = RecommenderTool()
+    context = "Heart rate and hydration during exercise"
+    
+    result = tool.get_personalized_recommendations(context, top_n=3)
+    
+    _assert_same(result, _reference_recommendations(encoder, context, tool.recommendation_templates, 3, tool.similarity_threshold), tolerance=1e-2)
+
+
+def test_template_embeddings_loaded_from_disk(encoder, tmp_path):
+    """Test template embeddings are encoded once and memory-mapped on later starts."""
+    first = RecommenderTool()
+    encoder.encoded.clear()
+    
+    second = RecommenderTool()
+    
+    assert encoder.encoded == []
+    assert isinstance(second._template_embeddings, np.memmap)
+    np.testing.assert_array_equal(second._template_embeddings, first._template_embeddings)
+    assert len(list(tmp_path.glob("template_embeddings_*.npy"))) == 1
+
+
+def test_candidate_embeddings_cached(encoder):
+    """Test repeated candidates are encoded only once."""
+    tool = RecommenderTool()
+    candidates = ["Drink water often", "Walk daily"]
+    encoder.encoded.clear()
+    
+    tool.get_personalized_recommendations("water", candidates)
+    tool.get_personalized_recommendations("walking", candidates)
+    
+    assert encoder.encoded == ["Drink water often", "Walk daily", "water", "walking"]
+
+
+@pytest.fixture
+def make_rag(tmp_path):
+    """Factory for RAGTools sharing one on-disk vector store, with fake embeddings."""
+    with patch('app.utils.tools.SharedEncoderEmbeddings', lambda *args, **kwargs: FakeEmbeddings()):
+        yield lambda: RAGTool(vector_store_path=str(tmp_path / "vector_store"))
+
+
+def test_vector_store_memory_mapped_on_reload(make_rag):
+    """Test a saved store is memory-mapped on load and still accepts new documents."""
+    make_rag()
+    
+    rag = make_rag()
+    assert rag._index_mmapped == hasattr(faiss, "IO_FLAG_MMAP_IFC")
+    
+    rag.add_documents(["Stretching before runs reduces injury risk"])
+    
+    assert not rag._index_mmapped
+    assert make_rag().retrieve("stretching before runs reduces injury risk", k=1) == ["Stretching before runs reduces injury risk"]
+
+
+def test_vector_store_falls_back_when_mmap_fails(make_rag):
+    """Test a failed memory-mapped read loads the index normally instead of rebuilding it."""
+    make_rag().add_documents(["Stretching before runs reduces injury risk"])
+    read_index = faiss.read_index
+    
+    def read_index_without_mmap(path, *flags):
+        if flags:
+            raise RuntimeError("mmap not supported")
+        return read_index(path)
+    
+    with patch('app.utils.tools.faiss.read_index', side_effect=read_index_without_mmap):
+        rag = make_rag()
+    
+    assert not rag._index_mmapped
+    assert rag.vector_store.index.ntotal == 11
+    assert rag.retrieve("stretching before runs reduces injury risk", k=1) == ["Stretching before runs reduces injury risk"]
+
+
+def test_concurrent_instances_keep_index_and_docstore_aligned(make_rag):
+    """Test an add after another instance saved the same store never misaligns vectors and docstore ids."""
+    first, second = make_rag(), make_rag()
+    
+    first.add_documents(["Stretching before runs reduces injury risk"])
+    second.add_documents(["Cold showers may improve alertness"])
+    
+    assert second.retrieve("cold showers may improve alertness", k=1) == ["Cold showers may improve alertness"]
+    reloaded = make_rag()
+    assert reloaded.vector_store.index.ntotal == len(reloaded.vector_store.index_to_docstore_id)
+    assert reloaded.retrieve("cold showers may improve alertness", k=1) == ["Cold showers may improve alertness"]
+    assert len(reloaded.retrieve("sleep", k=reloaded.vector_store.index.ntotal)) == reloaded.vector_store.index.ntotal
+
+
+def test_save_replaces_index_file(make_rag):
+    """Test saving swaps in a new index file rather than rewriting the mapped one in place."""
+    rag = make_rag()
+    index_path = os.path.join(rag.vector_store_path, "index.faiss")
+    before = os.stat(index_path).st_ino
+    
+    rag.add_documents(["Stretching before runs reduces injury risk"])
+    
+    assert os.stat(index_path).st_ino != before
+    assert sorted(os.listdir(rag.vector_store_path)) == ["index.faiss", "index.pkl"]
+
+
+def _count_searches(rag):
+    """Wrap the vector search so tests can count cache misses."""
+    rag.vector_store.similarity_search_by_vector = Mock(wraps=rag.vector_store.similarity_search_by_vector)
+    return rag.vector_store.similarity_search_by_vector
+
+
+def test_semantic_cache_hit_threshold(make_rag, monkeypatch):
+    """Test near-duplicate queries with the same k are served from the cache."""
+    # Cosine("sleep improves mood", "sleep improves") is ~0.96 under the fake encoder
+    monkeypatch.setenv("SEMANTIC_CACHE_THRESHOLD", "0.95")
+    rag = make_rag()
+    searches = _count_searches(rag)
+    
+    first = rag.retrieve("sleep improves mood", k=2)
+    assert rag.retrieve("mood improves sleep", k=2) == first
+    assert rag.retrieve("sleep improves", k=2) == first
+    assert searches.call_count == 1
+    
+    rag.retrieve("mood improves sleep", k=1)
+    assert searches.call_count == 2
+    
+    monkeypatch.setenv("SEMANTIC_CACHE_THRESHOLD", "0.99")
+    strict = make_rag()
+    searches = _count_searches(strict)
+    strict.retrieve("sleep improves mood", k=2)
+    strict.retrieve("sleep improves", k=2)
+    assert searches.call_count == 2
+
+
+def test_semantic_cache_evicts_oldest(make_rag, monkeypatch):
+    """Test the cache keeps only the most recent SEMANTIC_CACHE_SIZE queries."""
+    monkeypatch.setenv("SEMANTIC_CACHE_SIZE", "2")
+    rag = make_rag()
+    searches = _count_searches(rag)
+    
+    for query in ("sleep", "hydration", "exercise"):
+        rag.retrieve(query)
+    rag.retrieve("exercise")
+    rag.retrieve("hydration")
+    assert searches.call_count == 3
+    
+    rag.retrieve("sleep")
+    assert searches.call_count == 4
+
+
+def test_semantic_cache_cleared_by_add_documents(make_rag):
+    """Test adding documents invalidates cached results."""
+    rag = make_rag()
+    searches = _count_searches(rag)
+    rag.retrieve("stretching before runs", k=1)
+    
+    rag.add_documents(["Stretching before runs reduces injury risk"])
+    searches = _count_searches(rag)
+    
+    assert rag.retrieve("stretching before runs", k=1) == ["Stretching before runs reduces injury risk"]
+    assert searches.call_count == 1
+
+
+def test_add_documents_bumps_version(make_rag):
+    """Test each add_documents call bumps the store version used by retrieval caches."""
+    rag = make_rag()
+    version = rag.version
+    
+    rag.add_documents(["Stretching before runs reduces injury risk"])
+    
+    assert rag.version == version + 1
\ No newline at end of file